@@ -0,0 +1,231 @@
+"""Re-encodes oversized image originals and points their references at the result.
+
+    python compact_images.py [--format webp] [--quality 82] [--max-size 2560]
+                             [--min-bytes 524288] [--workers N] [--dry-run]
+
+Scans every image referenced from houses.main_image, apartments.main_image,
+house_images and apartment_images. Encoding runs across all cores in a
+process pool; each replacement updates every reference in one transaction.
+Processed images are appended to a journal, so an interrupted run resumes where
+it stopped. Each replacement bumps the shared table versions, so API workers
+drop cached responses naming the old file within one poll interval. The old
+files stay on disk until no cached response can name them any more (see
+UNLINK_AFTER) and a later run unlinks them. This makes the tool safe to run
+while the API is serving.
+
+Each run also sweeps content-addressed files that no row references, e.g. ones
+whose release was pending when a worker restarted, and expired grace pins.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+from sqlalchemy import select, union, update
+from config.cache import RESPONSE_CACHE_TTL, RESPONSE_CACHE_STALE_TTL, TABLE_VERSIONS_MAX_LAG
+from config.database import AsyncSessionLocal
+from config.images import (IMAGE_DIR, IMAGE_COMPACT_FORMAT, IMAGE_COMPACT_QUALITY, IMAGE_COMPACT_MAX_SIZE,
+                           IMAGE_COMPACT_MIN_BYTES, IMAGE_COMPACT_UNLINK_AFTER, IMAGE_COMPACT_JOURNAL)
+from models import House, HouseImage, Apartment, ApartmentImage
+from utils.derivatives import describe
+from utils.image import image_path, store_file, referenced_images, delete_image, prune_pins
+from utils.image_server import HASHED_NAME_RE
+from utils.version_sync import touch
+
+# A worker that never got the version bump still drops a cached response once
+# its fresh and stale windows are over; clients revalidate (no-cache), but may
+# keep rendered pages open for IMAGE_COMPACT_UNLINK_AFTER
+UNLINK_AFTER = max(IMAGE_COMPACT_UNLINK_AFTER, RESPONSE_CACHE_TTL + RESPONSE_CACHE_STALE_TTL + TABLE_VERSIONS_MAX_LAG)
+
+
+def recompress(image: str, format: str, quality: int, max_size: int, min_bytes: int, dry_run: bool) -> dict:
+    # Runs in a worker process. Returns the journal entry of the image.
+    source = image_path(image)
+    size = os.path.getsize(source)
+    with Image.open(source) as original:
+        if getattr(original, 'is_animated', False):
+            return {'image': image, 'status': 'skipped', 'reason': 'animated'}
+        if max(original.size) <= max_size and size <= min_bytes:
+            return {'image': image, 'status': 'skipped', 'reason': 'small'}
+        converted = ImageOps.exif_transpose(original)
+        converted.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        if format == 'jpeg' and converted.mode != 'RGB':
+            converted = converted.convert('RGB')
+        elif converted.mode not in ('RGB', 'RGBA'):
+            converted = converted.convert('RGBA')
+        temp = os.path.join(IMAGE_DIR, f'.compact-{os.getpid()}-{os.urandom(4).hex()}.part')
+        converted.save(temp, format=format.upper(), quality=quality)
+    try:
+        new_size = os.path.getsize(temp)
+        if new_size >= size:
+            return {'image': image, 'status': 'skipped', 'reason': 'not smaller'}
+        if dry_run:
+            return {'image': image, 'status': 'replaced', 'new': None, 'bytes': size, 'saved': size - new_size}
+        new = store_file(temp)
+    finally:
+        os.remove(temp)
+    return {'image': image, 'status': 'replaced', 'new': new, 'bytes': size, 'saved': size - new_size,
+            'metadata': describe(image_path(new))}
+
+
+class Journal:
+    """Append-only JSON lines: one entry per processed image, 'unlinked' once
+    the replaced file is gone. Each entry is fsynced after its transaction."""
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['image']] = {**self.entries.get(entry['image'], {}), **entry}
+        self._file = open(path, 'a')
+
+    def append(self, entry: dict):
+        self.entries[entry['image']] = {**self.entries.get(entry['image'], {}), **entry}
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+async def referenced_names(session) -> list[str]:
+    statement = union(select(House.main_image), select(HouseImage.image),
+                      select(Apartment.main_image), select(ApartmentImage.image))
+    return sorted(name for name in (await session.execute(statement)).scalars()
+                  if name and name != 'placeholder.png')
+
+
+async def replace_references(session, entry: dict):
+    # Every reference to the old name moves to the new one in one transaction
+    old, new = entry['image'], entry['new']
+    metadata = {key: entry['metadata'][key] for key in ('width', 'height', 'size')}
+    async with session.begin():
+        # Bumped on commit: workers invalidate their response and facet caches
+        touch(session, House.__tablename__, Apartment.__tablename__,
+              HouseImage.__tablename__, ApartmentImage.__tablename__)
+        await session.execute(update(House).where(House.main_image == old).values(main_image=new))
+        await session.execute(update(Apartment).where(Apartment.main_image == old).values(main_image=new))
+        await session.execute(update(HouseImage).where(HouseImage.image == old).values(image=new, **metadata))
+        await session.execute(update(ApartmentImage).where(ApartmentImage.image == old).values(image=new, **metadata))
+
+
+async def unlink_replaced(session, journal: Journal, dry_run: bool) -> int:
+    # Old files of earlier replacements, once old enough and referenced by nothing
+    deadline = time.time() - UNLINK_AFTER
+    due = [entry['image'] for entry in journal.entries.values()
+           if entry['status'] == 'replaced' and entry.get('new') and entry['at'] < deadline]
+    if not due:
+        return 0
+    used = await referenced_images(session, due)
+    await session.rollback()
+    unlinked = 0
+    for image in due:
+        if image in used:
+            continue
+        if not dry_run:
+            if not delete_image(image):
+                # Re-uploaded meanwhile (IMAGE_DELETE_GRACE): retried by the next run
+                continue
+            journal.append({'image': image, 'status': 'unlinked', 'at': time.time()})
+        unlinked += 1
+    return unlinked
+
+
+def stored_names() -> list[str]:
+    # Content-addressed originals on disk, <IMAGE_DIR>/ab/cd/<sha256>.<ext>
+    paths = glob.glob(os.path.join(IMAGE_DIR, '[0-9a-f][0-9a-f]', '[0-9a-f][0-9a-f]', '*'))
+    names = (os.path.relpath(path, IMAGE_DIR).replace(os.sep, '/') for path in paths)
+    return sorted(name for name in names if HASHED_NAME_RE.match(name))
+
+
+async def collect_unreferenced(session, journal: Journal, dry_run: bool) -> int:
+    # Stored files no row points at. Replaced originals wait for unlink_replaced,
+    # files inside their grace window (a row may be about to commit) for the next run.
+    names = [name for name in stored_names() if journal.entries.get(name, {}).get('status') != 'replaced']
+    used = set()
+    for start in range(0, len(names), 1000):
+        used |= await referenced_images(session, names[start:start + 1000])
+    await session.rollback()
+    collected = 0
+    for name in names:
+        if name not in used and (dry_run or delete_image(name)):
+            collected += 1
+    if not dry_run:
+        prune_pins()
+    return collected
+
+
+async def compact(args) -> dict:
+    journal = Journal(IMAGE_COMPACT_JOURNAL)
+    report = {'scanned': 0, 'replaced': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'saved': 0, 'unlinked': 0,
+              'collected': 0}
+    started = time.monotonic()
+    try:
+        async with AsyncSessionLocal() as session:
+            report['unlinked'] += await unlink_replaced(session, journal, args.dry_run)
+            report['collected'] += await collect_unreferenced(session, journal, args.dry_run)
+            names = await referenced_names(session)
+            await session.rollback()
+            pending = [name for name in names
+                       if name not in journal.entries and (path := image_path(name)) and os.path.isfile(path)]
+            report['scanned'] = len(names)
+
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                async def process(name: str) -> dict:
+                    try:
+                        return await loop.run_in_executor(executor, recompress, name, args.format, args.quality,
+                                                          args.max_size, args.min_bytes, args.dry_run)
+                    except Exception as error:
+                        # Not journaled: retried by the next run
+                        return {'image': name, 'status': 'failed', 'error': repr(error)}
+
+                for task in asyncio.as_completed([process(name) for name in pending]):
+                    entry = await task
+                    entry['at'] = time.time()
+                    if entry['status'] == 'replaced':
+                        if not args.dry_run:
+                            await replace_references(session, entry)
+                        report['bytes'] += entry['bytes']
+                        report['saved'] += entry['saved']
+                    report[entry['status']] += 1
+                    if not args.dry_run and entry['status'] != 'failed':
+                        journal.append({key: value for key, value in entry.items() if key != 'metadata'})
+                    if not args.dry_run and entry['status'] == 'replaced':
+                        # Compacted output is never encoded a second time
+                        journal.append({'image': entry['new'], 'status': 'skipped', 'reason': 'compacted',
+                                        'at': entry['at']})
+                    detail = {'replaced': f" -> {entry.get('new')} (-{entry.get('saved')} bytes)",
+                              'skipped': f" ({entry.get('reason')})", 'failed': f" ({entry.get('error')})"}
+                    print(f"{entry['status']:>8} {entry['image']}{detail[entry['status']]}")
+    finally:
+        journal.close()
+    report['seconds'] = round(time.monotonic() - started, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--format', choices=('webp', 'avif', 'jpeg'), default=IMAGE_COMPACT_FORMAT)
+    parser.add_argument('--quality', type=int, default=IMAGE_COMPACT_QUALITY)
+    parser.add_argument('--max-size', type=int, default=IMAGE_COMPACT_MAX_SIZE, help='Longest side, px')
+    parser.add_argument('--min-bytes', type=int, default=IMAGE_COMPACT_MIN_BYTES)
+    parser.add_argument('--workers', type=int, default=None, help='Defaults to the number of CPUs')
+    parser.add_argument('--dry-run', action='store_true', help='Encode and report, change nothing')
+    report = asyncio.run(compact(parser.parse_args()))
+    print(f"scanned {report['scanned']}, replaced {report['replaced']}, skipped {report['skipped']}, "
+          f"failed {report['failed']}, unlinked {report['unlinked']}, collected {report['collected']} "
+          f"in {report['seconds']}s")
+    if report['bytes']:
+        print(f"saved {report['saved']} of {report['bytes']} bytes ({100 * report['saved'] / report['bytes']:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
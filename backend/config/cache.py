@@ -0,0 +1,21 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Catalog GET responses: fresh for TTL seconds, then served stale for up to
+# STALE_TTL more seconds while a single background request refreshes them.
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 30))
+RESPONSE_CACHE_STALE_TTL = int(os.getenv('RESPONSE_CACHE_STALE_TTL', 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2048))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Attribute/Parameter/ApartmentCategory copies are reloaded whenever the
+# shared table version changes; the TTL is a fallback on top of that.
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 60))
+
+# Workers poll the shared table versions every POLL_INTERVAL seconds and
+# invalidate what other workers changed. If polling falls behind by MAX_LAG
+# seconds, 304s and the response cache are switched off until it recovers.
+TABLE_VERSIONS_POLL_INTERVAL = float(os.getenv('TABLE_VERSIONS_POLL_INTERVAL', 1))
+TABLE_VERSIONS_MAX_LAG = float(os.getenv('TABLE_VERSIONS_MAX_LAG', 5))
@@ -1,8 +1,16 @@
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from utils.pool_metrics import PoolMetrics, timed_pool_class, instrument_engine
+from utils.versions import table_versions
+from utils.unit_of_work import unit_of_work
+from starlette.requests import Request
 from dotenv import load_dotenv
+import itertools
 import os 
+import time
 
 load_dotenv()
 Base = declarative_base()
@@ -12,13 +20,83 @@ PASSWORD_DB = os.getenv('PASSWORD_DB')
 HOST_DB = os.getenv('HOST_DB')
 NAME_DB = os.getenv('NAME_DB')
 
-engine = create_engine(f'mysql+pymysql://{USERNAME_DB}:{PASSWORD_DB}@{HOST_DB}/{NAME_DB}')
+# Pool settings are per engine and per worker process: the server sees up to
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections from the API.
+# DB_POOL_RECYCLE must stay below MySQL's wait_timeout.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+def pool_options(url: str, pool_class, metrics: PoolMetrics) -> dict:
+    if url.startswith('sqlite'):
+        # SQLite picks its own pool, sizing does not apply
+        return {}
+    return {
+        'poolclass': timed_pool_class(pool_class, metrics),
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+# Sync engine: alembic, startup jobs and scripts
+DATABASE_URL = f'mysql+pymysql://{USERNAME_DB}:{PASSWORD_DB}@{HOST_DB}/{NAME_DB}'
+engine_metrics = PoolMetrics('sync')
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, QueuePool, engine_metrics))
+instrument_engine(engine, engine_metrics)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_session():
-    db = SessionLocal()
-    try:
+# Async engine used by the API. ASYNC_DATABASE_URL overrides it, e.g. sqlite+aiosqlite:///./test.db
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL', f'mysql+aiomysql://{USERNAME_DB}:{PASSWORD_DB}@{HOST_DB}/{NAME_DB}')
+
+async_engine_metrics = PoolMetrics('primary')
+async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                   **pool_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, async_engine_metrics))
+instrument_engine(async_engine.sync_engine, async_engine_metrics)
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) refresh
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Optional read replicas, comma separated async URLs. GET/HEAD requests are
+# spread over them round robin, everything else goes to the primary.
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv('REPLICA_DATABASE_URLS', '').split(',') if url.strip()]
+# Upper bound of replication lag: how long reads stay on the primary after a write
+REPLICA_LAG_SECONDS = float(os.getenv('REPLICA_LAG_SECONDS', 5))
+READ_PRIMARY_COOKIE = 'read_primary'
+READ_PRIMARY_HEADER = 'X-Read-Primary'
+
+replica_engines = []
+for number, url in enumerate(REPLICA_DATABASE_URLS, start=1):
+    metrics = PoolMetrics(f'replica-{number}')
+    replica_engine = create_async_engine(url, **pool_options(url, AsyncAdaptedQueuePool, metrics))
+    instrument_engine(replica_engine.sync_engine, metrics)
+    replica_engines.append(replica_engine)
+
+ReplicaSessionLocals = [async_sessionmaker(bind=replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+                        for replica_engine in replica_engines]
+_replicas = itertools.cycle(ReplicaSessionLocals)
+
+def read_sessionmaker():
+    # Session factory for read-only work: next replica, or the primary without replicas
+    return next(_replicas) if ReplicaSessionLocals else AsyncSessionLocal
+
+def reads_from_primary(request: Request) -> bool:
+    if request.method not in ('GET', 'HEAD'):
+        return True
+    # Read-your-writes: explicit header, the cookie set after this client's last
+    # write (see utils/replicas.py), or any write within the lag window, made by
+    # this process or adopted from another worker: versions (and the ETags and
+    # cache entries built on them) must not get ahead of the rows they describe
+    if request.headers.get(READ_PRIMARY_HEADER) or request.cookies.get(READ_PRIMARY_COOKIE):
+        return True
+    last_write = max(table_versions.last_write, table_versions.last_remote_write)
+    return time.time() - last_write < REPLICA_LAG_SECONDS
+
+async def get_async_session(request: Request):
+    factory = AsyncSessionLocal if reads_from_primary(request) else read_sessionmaker()
+    async with unit_of_work(factory) as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
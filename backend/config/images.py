@@ -0,0 +1,54 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+IMAGE_DIR = os.getenv('IMAGE_DIR', 'images')
+# Uploads are streamed to disk in IMAGE_CHUNK_SIZE pieces and rejected as soon
+# as they pass IMAGE_MAX_BYTES, so memory use does not depend on file size.
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+IMAGE_CHUNK_SIZE = int(os.getenv('IMAGE_CHUNK_SIZE', 64 * 1024))
+# Files written at the same time, across all requests of the worker
+IMAGE_UPLOAD_CONCURRENCY = int(os.getenv('IMAGE_UPLOAD_CONCURRENCY', 4))
+
+# Resized copies served with ?w=: requested widths are rounded up to one of
+# IMAGE_WIDTHS, formats are tried in order against the Accept header.
+IMAGE_WIDTHS = tuple(sorted(int(width) for width in os.getenv('IMAGE_WIDTHS', '320,640,1280').split(',')))
+IMAGE_FORMATS = tuple(os.getenv('IMAGE_FORMATS', 'avif,webp,jpeg').split(','))
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 80))
+IMAGE_DERIVATIVE_DIR = os.getenv('IMAGE_DERIVATIVE_DIR', os.path.join(IMAGE_DIR, 'derivatives'))
+# Processes encoding derivatives, defaults to the number of CPUs
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 0)) or None
+# Files stored or re-uploaded within this many seconds are never unlinked:
+# an upload deduplicated against them may not have committed its row yet.
+# The window starts at the mtime of the file's pin in IMAGE_PIN_DIR.
+IMAGE_DELETE_GRACE = int(os.getenv('IMAGE_DELETE_GRACE', 60))
+IMAGE_PIN_DIR = os.getenv('IMAGE_PIN_DIR', os.path.join(IMAGE_DIR, '.pins'))
+
+# Image serving: files up to IMAGE_HOT_FILE_MAX_BYTES are kept in an in-memory
+# LRU bounded by IMAGE_HOT_CACHE_BYTES, larger ones are streamed from a mmap.
+IMAGE_HOT_CACHE_BYTES = int(os.getenv('IMAGE_HOT_CACHE_BYTES', 64 * 1024 * 1024))
+IMAGE_HOT_FILE_MAX_BYTES = int(os.getenv('IMAGE_HOT_FILE_MAX_BYTES', 256 * 1024))
+IMAGE_STREAM_CHUNK_SIZE = int(os.getenv('IMAGE_STREAM_CHUNK_SIZE', 256 * 1024))
+# Width of the blurred placeholder embedded in image responses as a data URI
+IMAGE_LQIP_WIDTH = int(os.getenv('IMAGE_LQIP_WIDTH', 16))
+
+# Resumable uploads (routers/uploads.py): chunks are written in place into one
+# file per session under IMAGE_UPLOAD_DIR; idle sessions expire after the TTL.
+# Chunks other than the last are at least MIN_CHUNK_SIZE, at most MAX_CHUNKS per upload.
+IMAGE_UPLOAD_DIR = os.getenv('IMAGE_UPLOAD_DIR', os.path.join(IMAGE_DIR, '.uploads'))
+IMAGE_UPLOAD_CHUNK_SIZE = int(os.getenv('IMAGE_UPLOAD_CHUNK_SIZE', 2 * 1024 * 1024))
+IMAGE_UPLOAD_MIN_CHUNK_SIZE = int(os.getenv('IMAGE_UPLOAD_MIN_CHUNK_SIZE', 256 * 1024))
+IMAGE_UPLOAD_MAX_CHUNKS = int(os.getenv('IMAGE_UPLOAD_MAX_CHUNKS', 64))
+IMAGE_UPLOAD_SESSION_TTL = int(os.getenv('IMAGE_UPLOAD_SESSION_TTL', 24 * 60 * 60))
+
+# compact_images.py: originals wider or taller than IMAGE_COMPACT_MAX_SIZE, or
+# heavier than IMAGE_COMPACT_MIN_BYTES, are re-encoded when that makes them smaller.
+# Replaced files are unlinked by a later run, IMAGE_COMPACT_UNLINK_AFTER seconds on
+# and never before the response cache windows (config/cache.py) are over.
+IMAGE_COMPACT_FORMAT = os.getenv('IMAGE_COMPACT_FORMAT', 'webp')
+IMAGE_COMPACT_QUALITY = int(os.getenv('IMAGE_COMPACT_QUALITY', 82))
+IMAGE_COMPACT_MAX_SIZE = int(os.getenv('IMAGE_COMPACT_MAX_SIZE', 2560))
+IMAGE_COMPACT_MIN_BYTES = int(os.getenv('IMAGE_COMPACT_MIN_BYTES', 512 * 1024))
+IMAGE_COMPACT_UNLINK_AFTER = int(os.getenv('IMAGE_COMPACT_UNLINK_AFTER', 60 * 60))
+IMAGE_COMPACT_JOURNAL = os.getenv('IMAGE_COMPACT_JOURNAL', os.path.join(IMAGE_DIR, '.compaction.jsonl'))
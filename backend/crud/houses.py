@@ -1,4 +1,4 @@
-from utils.abstract_repository import IREpository
+from utils.abstract_repository import AsyncIREpository
 
-class HouseRepository(IREpository):
+class HouseRepository(AsyncIREpository):
     ...
\ No newline at end of file
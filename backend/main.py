@@ -1,19 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
 from routers import routers
+from routers.images import router as image_router
 from starlette.middleware.cors import CORSMiddleware
-app = FastAPI(title="Build-Service API")
+from config.database import AsyncSessionLocal
+from utils.response_cache import ResponseCacheMiddleware
+from utils.replicas import ReadYourWritesMiddleware
+from utils.derivatives import shutdown_executor
+from utils.version_sync import seed_table_versions, sync_table_versions, refresh_search_index, poll_table_versions
+import asyncio
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await seed_table_versions(AsyncSessionLocal)
+    await sync_table_versions(AsyncSessionLocal)
+    await refresh_search_index(AsyncSessionLocal)
+    poller = asyncio.create_task(poll_table_versions(AsyncSessionLocal))
+    yield
+    poller.cancel()
+    shutdown_executor()
+
+app = FastAPI(title="Build-Service API", lifespan=lifespan)
 
 app.include_router(routers)
+app.include_router(image_router, tags=['images'])
 
+app.add_middleware(ResponseCacheMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:3001"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimate", "X-Cache"],
 )
-
-@app.get('/{image_name}')
-async def get_image(image_name: str):
-    return FileResponse(f'./images/{image_name}')
\ No newline at end of file
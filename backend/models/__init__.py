@@ -2,3 +2,4 @@ from .orders import *
 from .houses import *
 from .apartments import *
 from .users import *
+from .versions import *
\ No newline at end of file
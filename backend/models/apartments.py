@@ -1,6 +1,6 @@
 from config.database import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Text, DECIMAL, ForeignKey
+from sqlalchemy import Integer, String, Text, DECIMAL, ForeignKey, Index
 
 class ApartmentCategory(Base):
     __tablename__ = 'apartment_category'
@@ -13,6 +13,12 @@ class ApartmentCategory(Base):
 
 class Apartment(Base):
     __tablename__ = 'apartments'
+    __table_args__ = (
+        Index('ix_apartments_area_id', 'area', 'id'),
+        Index('ix_apartments_rooms_id', 'rooms', 'id'),
+        Index('ix_apartments_id_house_rooms_area', 'id_house', 'rooms', 'area'),
+        Index('ix_apartments_id_category_rooms_area', 'id_category', 'rooms', 'area'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255))
@@ -42,6 +48,9 @@ class Parameter(Base):
 
 class ApartmentParameter(Base):
     __tablename__ = 'apartments_parameters'
+    __table_args__ = (
+        Index('ix_apartments_parameters_id_parameter_value_id_apartment', 'id_parameter', 'value', 'id_apartment'),
+    )
 
     id_apartment: Mapped[int] = mapped_column(ForeignKey("apartments.id"), primary_key=True)
     id_parameter: Mapped[int] = mapped_column(ForeignKey("parameters.id"), primary_key=True)
@@ -57,5 +66,11 @@ class ApartmentImage(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     image: Mapped[str] = mapped_column(String(255))
     id_apartment: Mapped[int] = mapped_column(ForeignKey("apartments.id"))
+    # Метаданные, вычисляются при загрузке
+    width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    dominant_color: Mapped[str | None] = mapped_column(String(7), nullable=True)
+    lqip: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     apartment: Mapped["Apartment"] = relationship("Apartment", back_populates="images")
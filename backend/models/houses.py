@@ -1,10 +1,19 @@
 from config.database import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Text, DECIMAL, ForeignKey, Boolean, DATE
+from sqlalchemy import Integer, String, Text, DECIMAL, ForeignKey, Boolean, DATE, Index
 from datetime import date
 
 class House(Base):
     __tablename__ = 'houses'
+    __table_args__ = (
+        # Ключи сортировки для keyset-пагинации (sort_key, id)
+        Index('ix_houses_start_price_id', 'start_price', 'id'),
+        Index('ix_houses_begin_date_id', 'begin_date', 'id'),
+        # Типовые фильтры каталога: статус/район/заказ + диапазон цены или даты
+        Index('ix_houses_status_district_start_price', 'status', 'district', 'start_price'),
+        Index('ix_houses_is_order_status_start_price', 'is_order', 'status', 'start_price'),
+        Index('ix_houses_status_begin_date', 'status', 'begin_date'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255))
@@ -41,6 +50,10 @@ class Attribute(Base):
 
 class HouseAttribute(Base):
     __tablename__ = 'house_attributes'
+    __table_args__ = (
+        # Покрывающий индекс для фильтра по нескольким атрибутам
+        Index('ix_house_attributes_id_attribute_value_id_house', 'id_attribute', 'value', 'id_house'),
+    )
 
     id_house: Mapped[int] = mapped_column(ForeignKey('houses.id'), primary_key=True)
     id_attribute: Mapped[int] = mapped_column(ForeignKey('attributes.id'), primary_key=True)
@@ -57,6 +70,12 @@ class HouseImage(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     id_house: Mapped[int] = mapped_column(ForeignKey("houses.id"))
     image: Mapped[str] = mapped_column(String(255))
+    # Метаданные, вычисляются при загрузке
+    width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    dominant_color: Mapped[str | None] = mapped_column(String(7), nullable=True)
+    lqip: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     # Связь
     house: Mapped["House"] = relationship("House", back_populates="images")
@@ -1,10 +1,13 @@
 from config.database import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DECIMAL, ForeignKey, DATE
+from sqlalchemy import Integer, String, DECIMAL, ForeignKey, DATE, Index
 from datetime import date
 
 class Order(Base):
     __tablename__ = 'orders'
+    __table_args__ = (
+        Index('ix_orders_create_date_id', 'create_date', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     id_user: Mapped[int] = mapped_column(ForeignKey("users.id"))
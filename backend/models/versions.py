@@ -0,0 +1,12 @@
+from config.database import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, BigInteger, String
+
+class TableVersion(Base):
+    # Общий для всех воркеров счётчик записей в таблицу (utils/versions.py)
+    __tablename__ = 'table_versions'
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    # Время последней записи, unix-секунды
+    modified: Mapped[int] = mapped_column(BigInteger)
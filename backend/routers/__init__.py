@@ -6,6 +6,10 @@ from routers.orders import router as order_router
 from routers.attributes import router as attribute_router
 from routers.parameters import router as parameter_router
 from routers.apartment_category import router as apartment_category_router
+from routers.export import router as export_router
+from routers.search import router as search_router
+from routers.admin import router as admin_router
+from routers.uploads import router as upload_router
 from fastapi import APIRouter
 
 routers = APIRouter(prefix='/api')
@@ -16,4 +20,8 @@ routers.include_router(house_router, prefix='/houses', tags=['houses'])
 routers.include_router(order_router, prefix='/orders', tags=['orders'])
 routers.include_router(attribute_router, prefix='/house_attributes', tags=['house_attributes'])
 routers.include_router(parameter_router, prefix='/apartment_parameters', tags=['apartment_parameters'])
-routers.include_router(apartment_category_router, prefix='/apartment_category', tags=['apartment_category'])
\ No newline at end of file
+routers.include_router(apartment_category_router, prefix='/apartment_category', tags=['apartment_category'])
+routers.include_router(export_router, prefix='/export', tags=['export'])
+routers.include_router(search_router, prefix='/search', tags=['search'])
+routers.include_router(admin_router, prefix='/admin', tags=['admin'])
+routers.include_router(upload_router, prefix='/uploads', tags=['uploads'])
\ No newline at end of file
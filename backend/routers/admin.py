@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Depends
+from dependencies import get_current_admin
+from schemas.admin import PoolStats
+from utils.pool_metrics import pool_metrics
+
+router = APIRouter()
+
+@router.get('/pool', status_code=200, response_model=list[PoolStats], response_model_exclude_none=True)
+async def get_pool_stats(admin = Depends(get_current_admin)):
+    return [metrics.snapshot() for metrics in pool_metrics.values()]
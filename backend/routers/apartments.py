@@ -1,155 +1,166 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
-from utils.image import save_image, delete_image
-from dependencies import ApartmentService, get_apartment_service
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Response, Body, BackgroundTasks
+from utils.image import save_image, save_images, release_images
+from utils.derivatives import generate_derivatives, describe_images
+from dependencies import ApartmentService, get_apartment_service, get_current_admin
 from utils.enums import Status
 from schemas.apartments import *
 from utils.to_dict import to_dict
+from utils.pagination import PageParams, set_page_headers
+from utils.filters import parse_value_filters
+from utils.versions import conditional_get
+from schemas.bulk import BulkItemResult, BULK_MAX_ITEMS
 
 router = APIRouter()
 
+# Tables an apartment response is built from
+apartment_etag = conditional_get('apartments', 'apartment_category', 'apartments_parameters', 'parameters', 'apartment_images')
+
+def build_apartment_response(apartment, category, parameters, images) -> ApartmentResponse:
+    # parameters: iterable of (Parameter, value) pairs
+    apartment_resp = to_dict(apartment)
+    apartment_resp.update({
+        'category': ApartmentCategoryResponse(**to_dict(category)),
+        'parameters': [ApartmentParameterResponse(parameter=ParameterResponse(**to_dict(parameter)), value=value)
+                       for parameter, value in parameters],
+        'images': [ApartmentImageResponse(**to_dict(image)) for image in images]
+    })
+    return ApartmentResponse(**apartment_resp)
+
 @router.post('/', status_code=201)
 async def create_apartment(data: CreateApartment,
                             apartment_service: ApartmentService = Depends(get_apartment_service)):
-    new_apartment = apartment_service.create_apartment(data)
+    new_apartment = await apartment_service.create_apartment(data)
     if new_apartment == Status.FAILED.value:
         raise HTTPException(status_code=400, detail={'status': Status.FAILED.value})
     return Status.SUCCESS.value
 
-@router.get('/', status_code=200, response_model=list[ApartmentResponse])
-async def get_all_apartments(name: str | None = Query(None),
-                             id_category: int | None = Query(None),
-                             rooms: int | None = Query(None),
-                             area: float | None = Query(None),
-                             id_house: int | None = Query(None),
-                             count: int | None = Query(None),
-                             id_parameter: int | None = Query(None),
-                             parameter_value: str | None = Query(None),
+@router.post('/bulk', status_code=200, response_model=list[BulkItemResult])
+async def create_apartments_bulk(data: list[CreateApartment] = Body(..., min_length=1, max_length=BULK_MAX_ITEMS),
+                                 apartment_service: ApartmentService = Depends(get_apartment_service)):
+    return await apartment_service.create_apartments_bulk(data)
+
+def apartment_filter(name: str | None = Query(None),
+                     id_category: int | None = Query(None),
+                     rooms: int | None = Query(None),
+                     min_rooms: int | None = Query(None),
+                     max_rooms: int | None = Query(None),
+                     area: float | None = Query(None),
+                     min_area: float | None = Query(None),
+                     max_area: float | None = Query(None),
+                     id_house: int | None = Query(None),
+                     count: int | None = Query(None),
+                     id_parameter: int | None = Query(None),
+                     parameter_value: str | None = Query(None),
+                     parameter: list[str] | None = Query(None, description='Repeatable <id_parameter>:<value>, all must match')
+                     ) -> dict:
+    filter = {k: v for k, v in locals().items() if v is not None and not k.startswith(('min_', 'max_'))
+              and k not in {'parameter_value', 'id_parameter', 'parameter'}}
+    filter['ranges'] = {
+        'rooms': (min_rooms, max_rooms),
+        'area': (min_area, max_area),
+    }
+    filter['parameters'] = parse_value_filters(parameter, id_parameter, parameter_value)
+    return filter
+
+@router.get('/', status_code=200, response_model=list[ApartmentResponse], dependencies=[Depends(apartment_etag)])
+async def get_all_apartments(response: Response,
+                             filter: dict = Depends(apartment_filter),
+                             page: PageParams = Depends(),
                              apartment_service: ApartmentService = Depends(get_apartment_service)):
-    filter = {k: v for k, v in locals().items() if v is not None 
-              and k not in {'apartment_service', 'parameter_value', 'id_parameter'}}
-    apartments = apartment_service.get_all_apartments_filter_by(**filter, id_parameter=id_parameter, parameter_value=parameter_value)
+    apartments_page = await apartment_service.get_apartments_page(page, **filter)
+    apartments = apartments_page.items
     if not apartments:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    response = []
-    for apartment in apartments:
-        category = apartment_service.get_one_apartment_category_filter_by(id=apartment.id_category)
-        category_resp = ApartmentCategoryResponse(**to_dict(category))
-
-        parameter_assoc = apartment_service.get_all_apartment_parameter_filter_by(id_apartment=apartment.id)
-        parameters_list = []
-        for param_assoc in parameter_assoc:
-            parameter = apartment_service.get_one_parameter_filter_by(id=param_assoc.id_parameter)
-            parameter_resp = ParameterResponse(**to_dict(parameter))
-
-            parameters_list.append(ApartmentParameterResponse(
-                parameter=parameter_resp,
-                value=param_assoc.value
-            ))
-
-        apart_images = apartment_service.get_all_apartment_image_filter_by(id_apartment=apartment.id)
-        apart_images_list = [ApartmentImageResponse(**to_dict(image)) for image in apart_images]
+    set_page_headers(response, apartments_page)
+    relations = await apartment_service.get_apartments_relations(apartments)
+    return [build_apartment_response(apartment, *relations[apartment.id]) for apartment in apartments]
 
-        apartment_resp = to_dict(apartment)
-        apartment_resp.update({
-            'category': category_resp,
-            'parameters': parameters_list,
-            'images': apart_images_list
-        })
-        response.append(ApartmentResponse(**apartment_resp))
-    return response
+@router.get('/facets', status_code=200, response_model=ApartmentFacetsResponse, dependencies=[Depends(apartment_etag)])
+async def get_apartment_facets(filter: dict = Depends(apartment_filter),
+                               apartment_service: ApartmentService = Depends(get_apartment_service)):
+    return await apartment_service.get_apartments_facets(**filter)
 
-@router.get('/{id}', status_code=200, response_model=ApartmentResponse)
+@router.get('/{id}', status_code=200, response_model=ApartmentResponse, dependencies=[Depends(apartment_etag)])
 async def get_apartment(id: int,
                               apartment_service: ApartmentService = Depends(get_apartment_service)):
-    apartment = apartment_service.get_one_apartment_filter_by(id=id)
+    apartment = await apartment_service.get_one_apartment_filter_by(id=id)
     if not apartment:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    category = apartment_service.get_one_apartment_category_filter_by(id=apartment.id_category)
-    category_resp = ApartmentCategoryResponse(**to_dict(category))
-
-    parameter_assoc = apartment_service.get_all_apartment_parameter_filter_by(id_apartment=apartment.id)
-    parameters_list = []
-    for param_assoc in parameter_assoc:
-        parameter = apartment_service.get_one_parameter_filter_by(id=param_assoc.id_parameter)
-        parameter_resp = ParameterResponse(**to_dict(parameter))
-
-        parameters_list.append(ApartmentParameterResponse(
-            parameter=parameter_resp,
-            value=param_assoc.value
-        ))
-
-    apart_images = apartment_service.get_all_apartment_image_filter_by(id_apartment=apartment.id)
-    apart_images_list = [ApartmentImageResponse(**to_dict(image)) for image in apart_images]
-
-    apartment_resp = to_dict(apartment)
-    apartment_resp.update({
-        'category': category_resp,
-        'parameters': parameters_list,
-        'images': apart_images_list
-    })
-    return ApartmentResponse(**apartment_resp)
+    relations = await apartment_service.get_apartments_relations([apartment])
+    return build_apartment_response(apartment, *relations[apartment.id])
 
 @router.put('/{id}', status_code=200)
 async def update_apartment(id: int,
                            data: UpdateApartment,
+                           replace_parameters: bool = Query(False, description='Delete parameters missing from the payload'),
                            apartment_service: ApartmentService = Depends(get_apartment_service)): 
-    apartment = apartment_service.get_one_apartment_filter_by(id=id)
+    apartment = await apartment_service.get_one_apartment_filter_by(id=id)
     if not apartment:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    updated_apartment = apartment_service.update_apartment(id, data)
+    updated_apartment = await apartment_service.update_apartment(id, data, replace_parameters)
     if updated_apartment == Status.FAILED.value:
         raise HTTPException(status_code=400, detail={'status': Status.FAILED.value})
     return Status.SUCCESS.value
 
 @router.delete('/{id}', status_code=200)
 async def delete_apartment(id: int,
+                            background_tasks: BackgroundTasks,
                             apartment_service: ApartmentService = Depends(get_apartment_service)):
-    apartment = apartment_service.get_one_apartment_filter_by(id=id)
+    apartment = await apartment_service.get_one_apartment_filter_by(id=id)
     if not apartment:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    apartment_service.delete_apartment(id)
+    images = await apartment_service.delete_apartment(id)
+    background_tasks.add_task(release_images, images)
     return Status.SUCCESS.value
 
 # Apartment images
 @router.patch('/{id}/images', status_code=200)
 async def update_apartment_main_image(id: int,
+                                  background_tasks: BackgroundTasks,
                                   main_image: UploadFile = File(...),
-                                  apartment_service: ApartmentService = Depends(get_apartment_service)):
-    apartment = apartment_service.get_one_apartment_filter_by(id=id)
+                                  apartment_service: ApartmentService = Depends(get_apartment_service),
+                                  admin = Depends(get_current_admin)):
+    apartment = await apartment_service.get_one_apartment_filter_by(id=id)
     if not apartment:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    delete_image(apartment.main_image)
-    apartment_service.update_apartment(id, UpdateApartment(main_image=main_image.filename))
-    save_image(main_image)
+    old_image = apartment.main_image
+    image = await save_image(main_image)
+    await apartment_service.update_apartment(id, UpdateApartment(main_image=image))
+    background_tasks.add_task(generate_derivatives, [image])
+    if old_image != image:
+        background_tasks.add_task(release_images, [old_image])
     return Status.SUCCESS.value
     
 @router.post('/{id}/images', status_code=201)
 async def add_apartment_image(id: int,
+                          background_tasks: BackgroundTasks,
                           images: list[UploadFile] | None = File(None),
-                          apartment_service: ApartmentService = Depends(get_apartment_service)):
-    apartment = apartment_service.get_one_apartment_filter_by(id=id)
+                          apartment_service: ApartmentService = Depends(get_apartment_service),
+                          admin = Depends(get_current_admin)):
+    apartment = await apartment_service.get_one_apartment_filter_by(id=id)
     if not apartment:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
     if images:
-        for image in images:
-            apartment_image = ApartmentImageForm(id_apartment=id, image=image.filename)
-            apartment_service.create_apartment_image(apartment_image)
-            save_image(image)
+        images = await save_images(images)
+        await apartment_service.create_apartment_images(id, images, await describe_images(images))
+        background_tasks.add_task(generate_derivatives, images)
     return Status.SUCCESS.value
 
 @router.delete('/{id}/images', status_code=200)
 async def delete_apartment_image(id: int,
                              images: ImageToDelete,
-                             apartment_service: ApartmentService = Depends(get_apartment_service)):
-    apartment = apartment_service.get_one_apartment_filter_by(id=id)
+                             background_tasks: BackgroundTasks,
+                             apartment_service: ApartmentService = Depends(get_apartment_service),
+                             admin = Depends(get_current_admin)):
+    apartment = await apartment_service.get_one_apartment_filter_by(id=id)
     if not apartment:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
     ids_images = images.ids_images
     if ids_images:
         for id_image in ids_images:
-            image = apartment_service.get_one_apartment_image_filter_by(id=id_image)
+            image = await apartment_service.get_one_apartment_image_filter_by(id=id_image)
             if not image:
                 continue
-            apartment_service.delete_apartment_image(id_image)
-            delete_image(image.image)
+            await apartment_service.delete_apartment_image(id_image)
+            background_tasks.add_task(release_images, [image.image])
     return Status.SUCCESS.value
\ No newline at end of file
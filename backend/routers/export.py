@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from config.database import read_sessionmaker
+from dependencies import get_current_admin
+from models import House, Apartment, Order
+from utils.enums import ExportFormat, Status
+
+router = APIRouter()
+
+EXPORT_MODELS = {
+    'houses': House,
+    'apartments': Apartment,
+    'orders': Order,
+}
+CHUNK_SIZE = 500
+
+
+async def iter_rows(model):
+    # Own session: the request-scoped one is closed before a StreamingResponse starts sending.
+    # Bulk reads tolerate replica lag, so exports run on a replica when there is one.
+    # Plain column rows instead of ORM objects and a server-side cursor keep memory flat.
+    async with read_sessionmaker()() as db:
+        statement = select(*model.__table__.columns).order_by(model.id)
+        result = await db.stream(statement.execution_options(yield_per=CHUNK_SIZE))
+        async for partition in result.mappings().partitions():
+            yield partition
+
+
+async def iter_ndjson(model):
+    async for partition in iter_rows(model):
+        yield ''.join(json.dumps(dict(row), default=str, ensure_ascii=False) + '\n' for row in partition)
+
+
+async def iter_csv(model):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(model.__table__.columns.keys())
+    yield buffer.getvalue()
+    async for partition in iter_rows(model):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(row.values() for row in partition)
+        yield buffer.getvalue()
+
+
+@router.get('/{entity}', status_code=200)
+async def export(entity: str,
+                 format: ExportFormat = Query(ExportFormat.NDJSON),
+                 admin = Depends(get_current_admin)):
+    model = EXPORT_MODELS.get(entity)
+    if model is None:
+        raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
+    if format == ExportFormat.CSV:
+        content, media_type, extension = iter_csv(model), 'text/csv; charset=utf-8', 'csv'
+    else:
+        content, media_type, extension = iter_ndjson(model), 'application/x-ndjson', 'ndjson'
+    return StreamingResponse(content, media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="{entity}.{extension}"'})
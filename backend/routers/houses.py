@@ -1,23 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
-from utils.image import save_image, delete_image
-from dependencies import HouseService, get_house_service, ApartmentService, get_apartment_service
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Response, Body, BackgroundTasks
+from utils.image import save_image, save_images, release_images
+from utils.derivatives import generate_derivatives, describe_images
+from dependencies import HouseService, get_house_service, ApartmentService, get_apartment_service, get_current_admin
 from utils.enums import Status
 from schemas.apartments import *
 from schemas.houses import *
 from utils.to_dict import to_dict
+from routers.apartments import build_apartment_response
+from utils.pagination import PageParams, set_page_headers
+from utils.filters import parse_value_filters
+from utils.versions import conditional_get
+from schemas.bulk import BulkItemResult, BulkUpdateResult, BULK_MAX_ITEMS
 
 router = APIRouter()
 
+# Tables a house response is built from
+house_etag = conditional_get('houses', 'house_attributes', 'attributes', 'house_images',
+                             'apartments', 'apartment_category', 'apartments_parameters', 'parameters', 'apartment_images')
+
+def build_house_response(house) -> HouseResponse:
+    # house must come from the HouseService tree loader, relations are already loaded
+    house_resp = to_dict(house)
+    house_resp.update({
+        'images': [HouseImageResponse(**to_dict(image)) for image in house.images],
+        'attributes': [HouseAttributeResponse(attribute=AttributeResponse(**to_dict(attr_assoc.attribute)),
+                                              value=attr_assoc.value)
+                       for attr_assoc in house.attributes],
+        'apartments': [build_apartment_response(apartment,
+                                                apartment.category,
+                                                [(param_assoc.parameter, param_assoc.value) for param_assoc in apartment.parameters],
+                                                apartment.images)
+                       for apartment in house.apartments]
+    })
+    return HouseResponse(**house_resp)
+
 @router.post('/', status_code=201)
 async def create_house(data: CreateHouse,
                         house_service: HouseService = Depends(get_house_service)):
-    new_house = house_service.create_house(data)
+    new_house = await house_service.create_house(data)
     if new_house == Status.FAILED.value:
         raise HTTPException(status_code=400, detail={'status': Status.FAILED.value})
     return Status.SUCCESS.value
 
-@router.get('/', status_code=200, response_model=list[HouseResponse])
-async def get_all_houses(
+@router.post('/bulk', status_code=200, response_model=list[BulkItemResult])
+async def create_houses_bulk(data: list[CreateHouse] = Body(..., min_length=1, max_length=BULK_MAX_ITEMS),
+                             house_service: HouseService = Depends(get_house_service)):
+    return await house_service.create_houses_bulk(data)
+
+@router.patch('/bulk/status', status_code=200, response_model=BulkUpdateResult)
+async def update_houses_status(data: BulkHouseStatus,
+                               house_service: HouseService = Depends(get_house_service)):
+    updated = await house_service.update_houses_status(data.ids, data.status)
+    return {'status': Status.SUCCESS.value, 'updated': updated}
+
+def house_filter(
     name: str | None = Query(None),
     status: HouseStatus | None = Query(None),
     is_order: bool | None = Query(None),
@@ -29,193 +65,128 @@ async def get_all_houses(
     end_date: date | None = Query(None),
     start_price: float | None = Query(None),
     final_price: float | None = Query(None),
+    min_price: float | None = Query(None),
+    max_price: float | None = Query(None),
+    min_floors: int | None = Query(None),
+    max_floors: int | None = Query(None),
+    min_begin_date: date | None = Query(None),
+    max_begin_date: date | None = Query(None),
+    min_end_date: date | None = Query(None),
+    max_end_date: date | None = Query(None),
     id_attribute: int | None = Query(None),
     attribute_value: str | None = Query(None),
-    house_service: HouseService = Depends(get_house_service),
-    apartment_service: ApartmentService = Depends(get_apartment_service),
-):
-    filter = {k: v for k, v in locals().items() if v is not None and k not in ['house_service', 'apartment_service']}
-    houses = house_service.get_all_houses_filter_by(**filter, id_attribute=id_attribute, attribute_value=attribute_value)
-
-    if not houses:
+    attribute: list[str] | None = Query(None, description='Repeatable <id_attribute>:<value>, all must match'),
+) -> dict:
+    filter = {k: v for k, v in locals().items() if v is not None and not k.startswith(('min_', 'max_'))
+              and k not in {'id_attribute', 'attribute_value', 'attribute'}}
+    filter['ranges'] = {
+        'start_price': (min_price, max_price),
+        'floors': (min_floors, max_floors),
+        'begin_date': (min_begin_date, max_begin_date),
+        'end_date': (min_end_date, max_end_date),
+    }
+    filter['attributes'] = parse_value_filters(attribute, id_attribute, attribute_value)
+    return filter
+
+@router.get('/', status_code=200, response_model=list[HouseResponse], dependencies=[Depends(house_etag)])
+async def get_all_houses(response: Response,
+                         filter: dict = Depends(house_filter),
+                         page: PageParams = Depends(),
+                         house_service: HouseService = Depends(get_house_service)):
+    houses_page = await house_service.get_houses_page(page, **filter)
+    if not houses_page.items:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
+    set_page_headers(response, houses_page)
+    return [build_house_response(house) for house in houses_page.items]
 
-    response = []
-    for house in houses:
-        images = house_service.get_all_house_image_filter_by(id_house=house.id)
-        images_list = [HouseImageResponse(**to_dict(image)) for image in images]
-
-        attributes_assoc = house_service.get_all_house_attribute_filter_by(id_house=house.id)
-        attributes_list = []
-        for attr_assoc in attributes_assoc:
-            attribute = house_service.get_one_attribute_filter_by(id=attr_assoc.id_attribute)
-            attribute_resp = AttributeResponse(**to_dict(attribute))
-
-            attributes_list.append(HouseAttributeResponse(
-                attribute=attribute_resp,
-                value=attr_assoc.value
-            ))
-
-        apartments = apartment_service.get_all_apartments_filter_by(id_house=house.id)
-        apartments_list = []
-        for apartment in apartments:
-            category = apartment_service.get_one_apartment_category_filter_by(id=apartment.id_category)
-            category_resp = ApartmentCategoryResponse(**to_dict(category))
-
-            parameter_assoc = apartment_service.get_all_apartment_parameter_filter_by(id_apartment=apartment.id)
-            parameters_list = []
-            for param_assoc in parameter_assoc:
-                parameter = apartment_service.get_one_parameter_filter_by(id=param_assoc.id_parameter)
-                parameter_resp = ParameterResponse(**to_dict(parameter))
-
-                parameters_list.append(ApartmentParameterResponse(
-                    parameter=parameter_resp,
-                    value=param_assoc.value
-                ))
-
-            apart_images = apartment_service.get_all_apartment_image_filter_by(id_apartment=apartment.id)
-            apart_images_list = [ApartmentImageResponse(**to_dict(image)) for image in apart_images]
+@router.get('/facets', status_code=200, response_model=HouseFacetsResponse, dependencies=[Depends(house_etag)])
+async def get_house_facets(filter: dict = Depends(house_filter),
+                           house_service: HouseService = Depends(get_house_service)):
+    return await house_service.get_houses_facets(**filter)
 
-            apartment_resp = to_dict(apartment)
-            apartment_resp.update({
-                'category': category_resp,
-                'parameters': parameters_list,
-                'images': apart_images_list
-            })
-            apartments_list.append(apartment_resp)
-        
-        house_resp = to_dict(house)
-        house_resp.update({
-            'images': images_list,
-            'attributes': attributes_list,
-            'apartments': apartments_list
-        })
-        response.append(HouseResponse(**house_resp))
-    return response
-
-@router.get('/{id}', status_code=200, response_model=HouseResponse)
+@router.get('/{id}', status_code=200, response_model=HouseResponse, dependencies=[Depends(house_etag)])
 async def get_one_house(id: int,
-                        house_service: HouseService = Depends(get_house_service),
-                        apartment_service: ApartmentService = Depends(get_apartment_service)):
-    house = house_service.get_one_house_filter_by(id=id)
+                        house_service: HouseService = Depends(get_house_service)):
+    house = await house_service.get_one_house_tree_filter_by(id=id)
     if not house:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    images = house_service.get_all_house_image_filter_by(id_house=house.id)
-    images_list = [HouseImageResponse(**to_dict(image)) for image in images]
-
-    attributes_assoc = house_service.get_all_house_attribute_filter_by(id_house=house.id)
-    attributes_list = []
-    for attr_assoc in attributes_assoc:
-        attribute = house_service.get_one_attribute_filter_by(id=attr_assoc.id_attribute)
-        attribute_resp = AttributeResponse(**to_dict(attribute))
-
-        attributes_list.append(HouseAttributeResponse(
-            attribute=attribute_resp,
-            value=attr_assoc.value
-        ))
-
-    apartments = apartment_service.get_all_apartments_filter_by(id_house=house.id)
-    apartments_list = []
-    for apartment in apartments:
-        category = apartment_service.get_one_apartment_category_filter_by(id=apartment.id_category)
-        category_resp = ApartmentCategoryResponse(**to_dict(category))
-
-        parameter_assoc = apartment_service.get_all_apartment_parameter_filter_by(id_apartment=apartment.id)
-        parameters_list = []
-        for param_assoc in parameter_assoc:
-            parameter = apartment_service.get_one_parameter_filter_by(id=param_assoc.id_parameter)
-            parameter_resp = ParameterResponse(**to_dict(parameter))
-
-            parameters_list.append(ApartmentParameterResponse(
-                parameter=parameter_resp,
-                value=param_assoc.value
-            ))
-
-        apart_images = apartment_service.get_all_apartment_image_filter_by(id_apartment=apartment.id)
-        apart_images_list = [ApartmentImageResponse(**to_dict(image)) for image in apart_images]
-
-        apartment_resp = to_dict(apartment)
-        apartment_resp.update({
-            'category': category_resp,
-            'parameters': parameters_list,
-            'images': apart_images_list
-        })
-        apartments_list.append(apartment_resp)
-    
-    house_resp = to_dict(house)
-    house_resp.update({
-        'images': images_list,
-        'attributes': attributes_list,
-        'apartments': apartments_list
-    })
-    return HouseResponse(**house_resp)
+    return build_house_response(house)
 
 @router.put('/{id}', status_code=200)
 async def update_house(id: int,
                         data: UpdateHouse,
+                        replace_attributes: bool = Query(False, description='Delete attributes missing from the payload'),
                         house_service: HouseService = Depends(get_house_service)):
-    house = house_service.get_one_house_filter_by(id=id)
+    house = await house_service.get_one_house_filter_by(id=id)
     if not house:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    updated_house = house_service.update_house(id, data)
+    updated_house = await house_service.update_house(id, data, replace_attributes)
     if updated_house == Status.FAILED.value:
         raise HTTPException(status_code=400, detail={'status': Status.FAILED.value})
     return Status.SUCCESS.value
 
 @router.delete('/{id}', status_code=200)
 async def delete_house(id: int,
+                       background_tasks: BackgroundTasks,
                        house_service: HouseService = Depends(get_house_service),
                        apartment_service: ApartmentService = Depends(get_apartment_service)):
-    house = house_service.get_one_house_filter_by(id=id)
+    house = await house_service.get_one_house_filter_by(id=id)
     if not house:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    apartments = apartment_service.get_all_apartments_filter_by(id_house=id)
-    if apartments:
-        for apartment in apartments:
-            apartment_service.delete_apartment(apartment.id)
-    house_service.delete_house(id)
+    # Both services share the request's session: the cascade commits as one transaction
+    images = await apartment_service.delete_apartments(id_house=id)
+    images += await house_service.delete_house(id)
+    background_tasks.add_task(release_images, images)
     return Status.SUCCESS.value
 
 # Images
 @router.patch('/{id}/images', status_code=200)
 async def update_house_main_image(id: int,
+                                  background_tasks: BackgroundTasks,
                                   main_image: UploadFile = File(...),
-                                  house_service: HouseService = Depends(get_house_service)):
-    house = house_service.get_one_house_filter_by(id=id)
+                                  house_service: HouseService = Depends(get_house_service),
+                                  admin = Depends(get_current_admin)):
+    house = await house_service.get_one_house_filter_by(id=id)
     if not house:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    delete_image(house.main_image)
-    house_service.update_house(id, UpdateHouse(main_image=main_image.filename))
-    save_image(main_image)
+    old_image = house.main_image
+    image = await save_image(main_image)
+    await house_service.update_house(id, UpdateHouse(main_image=image))
+    background_tasks.add_task(generate_derivatives, [image])
+    if old_image != image:
+        background_tasks.add_task(release_images, [old_image])
     return Status.SUCCESS.value
     
 @router.post('/{id}/images', status_code=201)
 async def add_house_image(id: int,
+                          background_tasks: BackgroundTasks,
                           images: list[UploadFile] | None = File(None),
-                          house_service: HouseService = Depends(get_house_service)):
-    house = house_service.get_one_house_filter_by(id=id)
+                          house_service: HouseService = Depends(get_house_service),
+                          admin = Depends(get_current_admin)):
+    house = await house_service.get_one_house_filter_by(id=id)
     if not house:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
     if images:
-        for image in images:
-            house_image = HouseImageForm(id_house=id, image=image.filename)
-            house_service.create_house_image(house_image)
-            save_image(image)
+        images = await save_images(images)
+        await house_service.create_house_images(id, images, await describe_images(images))
+        background_tasks.add_task(generate_derivatives, images)
     return Status.SUCCESS.value
 
 @router.delete('/{id}/images', status_code=200)
 async def delete_house_image(id: int,
                              images: ImageToDelete,
-                             house_service: HouseService = Depends(get_house_service)):
-    house = house_service.get_one_house_filter_by(id=id)
+                             background_tasks: BackgroundTasks,
+                             house_service: HouseService = Depends(get_house_service),
+                             admin = Depends(get_current_admin)):
+    house = await house_service.get_one_house_filter_by(id=id)
     if not house:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
     ids_images = images.ids_images
     if ids_images:
         for id_image in ids_images:
-            image = house_service.get_one_house_image_filter_by(id=id_image)
+            image = await house_service.get_one_house_image_filter_by(id=id_image)
             if not image:
                 continue
-            house_service.delete_house_image(id_image)
-            delete_image(image.image)
+            await house_service.delete_house_image(id_image)
+            background_tasks.add_task(release_images, [image.image])
     return Status.SUCCESS.value
\ No newline at end of file
@@ -0,0 +1,29 @@
+import os
+from fastapi import APIRouter, HTTPException, Query, Request
+from PIL import UnidentifiedImageError
+from utils.enums import Status
+from utils.image import image_path
+from utils.derivatives import get_derivative, snap_width, negotiate_format, CONTENT_TYPES
+from utils.image_server import serve_file, hashed_etag, IMMUTABLE, DERIVATIVE, REVALIDATE
+
+router = APIRouter()
+
+# Catch-all path: included after the API routers
+@router.get('/{image_name:path}')
+async def get_image(image_name: str,
+                    request: Request,
+                    w: int | None = Query(None, gt=0, description='Width, rounded up to a configured size')):
+    path = image_path(image_name)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
+    if w is not None:
+        format = negotiate_format(request.headers.get('accept'))
+        try:
+            derivative = await get_derivative(image_name, snap_width(w), format)
+            return await serve_file(request, derivative, DERIVATIVE, media_type=CONTENT_TYPES[format],
+                                    headers={'Vary': 'Accept'})
+        except (UnidentifiedImageError, OSError):
+            # Not an image Pillow can decode: the original is the best we have
+            pass
+    etag = hashed_etag(image_name)
+    return await serve_file(request, path, IMMUTABLE if etag else REVALIDATE, etag=etag)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Response
 from typing import List
 from utils.image import save_image
 from dependencies import OrderService, get_order_service, HouseService, get_house_service, UserService, get_user_service, get_current_user
@@ -6,6 +6,7 @@ from utils.enums import Status, OrderStatus, HouseStatus, Roles
 from schemas.orders import *
 from schemas.houses import UpdateHouse
 from datetime import datetime
+from utils.pagination import PageParams, set_page_headers
 
 router = APIRouter()
 
@@ -22,14 +23,14 @@ async def create_order(data: CreateOrder,
         house = data.pop('house')
         house['status'] = HouseStatus.PROJECT.value
         house['is_order'] = True
-        create_house = house_service.create_house(CreateHouse(**house))
+        create_house = await house_service.create_house(CreateHouse(**house))
         if not create_house:
             raise HTTPException(status_code=400, detail={'status': Status.FAILED.value, 'message': 'House not created'})
         data['id_house'] = create_house.id
     elif data.get('id_house') is not None:
         house = data.pop('house')
         id_house = data['id_house']
-        house_data = house_service.get_one_house_filter_by(id=id_house)
+        house_data = await house_service.get_one_house_filter_by(id=id_house)
         if not house_data:
             raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value, 'message': 'House not found'})
         house = house_data.__dict__
@@ -38,48 +39,51 @@ async def create_order(data: CreateOrder,
         data['status'] = OrderStatus.SOLD.value
         data['contract_price'] = house_data.final_price 
         data['id_house'] = house['id']
-        update_house = house_service.update_house(id=id_house, upd_house=UpdateHouse(**house))
-    create_order = order_service.create_order(data)
+        update_house = await house_service.update_house(id=id_house, upd_house=UpdateHouse(**house))
+    create_order = await order_service.create_order(data)
     if not create_order:
         raise HTTPException(status_code=400, detail={'status': Status.FAILED.value, 'message': 'Order not created'})
     return Status.SUCCESS.value
 
 @router.get('/', status_code=200, response_model=List[OrderResponse])
-async def get_all_orders(id_user: int | None = Query(None),
+async def get_all_orders(response: Response,
+                         id_user: int | None = Query(None),
                          id_house: int | None = Query(None),
                          status: OrderStatus | None = Query(None),
                          contract_price: float | None = Query(None),
                          create_date: date | None = Query(None),
                          update_date: date | None = Query(None),
+                         page: PageParams = Depends(),
                          order_service: OrderService = Depends(get_order_service),
                          house_service: HouseService = Depends(get_house_service),
                          user_service: UserService = Depends(get_user_service),
                          user = Depends(get_current_user)):
     if user.role == Roles.ADMIN.value:
         filter = {k: v for k, v in locals().items() if v is not None and k 
-                    not in {'order_service', 'house_service', 'user_service', 'user'}}
+                    not in {'order_service', 'house_service', 'user_service', 'user', 'page', 'response'}}
     else:
         filter = {k: v for k, v in locals().items() if v is not None and k 
-                    not in {'order_service', 'house_service', 'user_service', 'user'}}
+                    not in {'order_service', 'house_service', 'user_service', 'user', 'page', 'response'}}
         filter['id_user'] = user.id
-    orders = order_service.get_all_orders_filter_by(**filter)
+    orders_page = await order_service.get_orders_page(page, **filter)
+    orders = orders_page.items
     if not orders:
         raise HTTPException(status_code=404, detail={'status': Status.FAILED.value})
-    response = []
+    set_page_headers(response, orders_page)
+    users = await user_service.get_users_by_ids({order.id_user for order in orders})
+    houses = await house_service.get_houses_by_ids({order.id_house for order in orders})
+    items = []
     for order in orders:
-        user = user_service.get_user_filter_by(id=order.id_user)
-        user_resp = UserResponse(**user.__dict__)
-
-        house = house_service.get_one_house_filter_by(id=order.id_house)
-        house_resp = ShortHouseResponse(**house.__dict__)
+        user_resp = UserResponse(**users[order.id_user].__dict__)
+        house_resp = ShortHouseResponse(**houses[order.id_house].__dict__)
 
         order_resp = order.__dict__
         order_resp.update({
             'user': user_resp,
             'house': house_resp
         })
-        response.append(OrderResponse(**order_resp))
-    return response
+        items.append(OrderResponse(**order_resp))
+    return items
 
 @router.get('/{id}', status_code=200, response_model=OrderResponse)
 async def get_one_order(id: int,
@@ -87,13 +91,13 @@ async def get_one_order(id: int,
                         house_service: HouseService = Depends(get_house_service),
                         user_service: UserService = Depends(get_user_service),
                         user = Depends(get_current_user)):
-    order = order_service.get_one_order_filter_by(id=id)
+    order = await order_service.get_one_order_filter_by(id=id)
     if not order:
         raise HTTPException(status_code=404, detail={'status': Status.FAILED.value})
-    user = user_service.get_user_filter_by(id=order.id_user)
+    user = await user_service.get_user_filter_by(id=order.id_user)
     user_resp = UserResponse(**user.__dict__)
 
-    house = house_service.get_one_house_filter_by(id=order.id_house)
+    house = await house_service.get_one_house_filter_by(id=order.id_house)
     house_resp = ShortHouseResponse(**house.__dict__)
 
     order_resp = order.__dict__
@@ -109,7 +113,7 @@ async def update_order(id: int,
                        order_service: OrderService = Depends(get_order_service),
                        house_service: HouseService = Depends(get_house_service),
                        user = Depends(get_current_user)):
-    order = order_service.get_one_order_filter_by(id=id)
+    order = await order_service.get_one_order_filter_by(id=id)
     if not order:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
     data = data.model_dump()
@@ -120,18 +124,18 @@ async def update_order(id: int,
             data['payment_date'] = datetime.now().strftime('%Y-%m-%d')
         elif new_status == OrderStatus.COMPLETED.value:
             data['completion_date'] = datetime.now().strftime('%Y-%m-%d')
-            house_service.update_house(order.id_house, UpdateHouse(status=HouseStatus.BUILT.value))
+            await house_service.update_house(order.id_house, UpdateHouse(status=HouseStatus.BUILT.value))
         elif new_status == OrderStatus.SIGNED.value:
             data['sign_off_date'] = datetime.now().strftime('%Y-%m-%d')
-    order_service.update_order(id, data)
+    await order_service.update_order(id, data)
     return Status.SUCCESS.value
 
 @router.delete('/{id}', status_code=200)
 async def delete_order(id: int,
                         order_service: OrderService = Depends(get_order_service),
                         user = Depends(get_current_user)):
-    order = order_service.get_one_order_filter_by(id=id)
+    order = await order_service.get_one_order_filter_by(id=id)
     if not order:
         raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
-    order_service.delete_order(id)
+    await order_service.delete_order(id)
     return Status.SUCCESS.value
\ No newline at end of file
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Query
+from typing import Literal
+from schemas.search import SearchHit
+from utils.search import search_index
+
+router = APIRouter()
+
+@router.get('/', status_code=200, response_model=list[SearchHit])
+async def search(q: str = Query(..., min_length=1),
+                 type: Literal['house', 'apartment'] | None = Query(None),
+                 limit: int = Query(20, ge=1, le=100)):
+    hits = search_index.search(q, kind=type, limit=limit)
+    return [SearchHit(type=kind, id=id, name=name, score=score) for kind, id, name, score in hits]
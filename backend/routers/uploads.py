@@ -0,0 +1,80 @@
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
+from dependencies import HouseService, get_house_service, ApartmentService, get_apartment_service, get_current_admin
+from utils.enums import Status
+from schemas.uploads import *
+from utils.image import store_file
+from utils.derivatives import generate_derivatives, describe_images
+from utils.unit_of_work import on_commit, on_rollback
+from utils.uploads import (create_session, session_state, write_chunk, data_path, upload_digest, delete_data,
+                           delete_session, claim_finalize, store_result, release_finalize)
+
+router = APIRouter()
+
+async def check_target(target: UploadTarget, id_target: int,
+                       house_service: HouseService, apartment_service: ApartmentService):
+    if target == UploadTarget.HOUSE:
+        found = await house_service.get_one_house_filter_by(id=id_target)
+    else:
+        found = await apartment_service.get_one_apartment_filter_by(id=id_target)
+    if not found:
+        raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
+
+@router.post('/', status_code=201, response_model=UploadSessionResponse)
+async def create_upload(data: CreateUploadSession,
+                        house_service: HouseService = Depends(get_house_service),
+                        apartment_service: ApartmentService = Depends(get_apartment_service),
+                        admin = Depends(get_current_admin)):
+    await check_target(data.target, data.id_target, house_service, apartment_service)
+    return create_session(data.target.value, data.id_target, data.size, data.filename, data.chunk_size)
+
+@router.get('/{id}', status_code=200, response_model=UploadSessionResponse)
+async def get_upload(id: str, admin = Depends(get_current_admin)):
+    return session_state(id)
+
+@router.put('/{id}/chunks/{index}', status_code=200, response_model=UploadSessionResponse)
+async def put_upload_chunk(id: str, index: int, request: Request, admin = Depends(get_current_admin)):
+    # Raw request body, chunk n covers bytes [n * chunk_size, (n + 1) * chunk_size)
+    return await write_chunk(id, index, request.stream())
+
+@router.post('/{id}/finalize', status_code=201, response_model=FinalizedUpload)
+async def finalize_upload(id: str,
+                          background_tasks: BackgroundTasks,
+                          house_service: HouseService = Depends(get_house_service),
+                          apartment_service: ApartmentService = Depends(get_apartment_service),
+                          admin = Depends(get_current_admin)):
+    upload = session_state(id)
+    if not upload['complete']:
+        raise HTTPException(status_code=409, detail={'status': Status.FAILED.value, 'message': 'Missing chunks',
+                                                     'received': upload['received']})
+    # A repeated finalize gets the committed result instead of a second image row
+    finalized = claim_finalize(id)
+    if finalized:
+        return finalized
+    try:
+        target = UploadTarget(upload['target'])
+        await check_target(target, upload['id_target'], house_service, apartment_service)
+
+        digest = await anyio.to_thread.run_sync(upload_digest, id)
+        image = await anyio.to_thread.run_sync(store_file, data_path(id), digest)
+        metadata = await describe_images([image])
+        if target == UploadTarget.HOUSE:
+            await house_service.create_house_images(upload['id_target'], [image], metadata)
+        else:
+            await apartment_service.create_apartment_images(upload['id_target'], [image], metadata)
+    except BaseException:
+        release_finalize(id)
+        raise
+    result = {'status': Status.SUCCESS.value, 'image': image}
+    # A failed commit releases the session for another finalize
+    on_commit(lambda: store_result(id, result))
+    on_rollback(lambda: release_finalize(id))
+    background_tasks.add_task(delete_data, id)
+    background_tasks.add_task(generate_derivatives, [image])
+    return result
+
+@router.delete('/{id}', status_code=200)
+async def delete_upload(id: str, admin = Depends(get_current_admin)):
+    session_state(id)
+    delete_session(id)
+    return Status.SUCCESS.value
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+class PoolStats(BaseModel):
+    name: str
+    pool_class: str
+    # Queue-based pools only
+    size: int | None = None
+    checkedin: int | None = None
+    checkedout: int | None = None
+    overflow: int | None = None
+    overflow_checkouts: int | None = None
+    checkouts: int
+    checkins: int
+    connects: int
+    invalidations: int
+    timeouts: int
+    wait_avg_ms: float
+    wait_max_ms: float
@@ -35,6 +35,11 @@ class ApartmentParameterForm(BaseModel):
 class ApartmentImageResponse(BaseModel):
     id: int
     image: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    size: Optional[int] = None
+    dominant_color: Optional[str] = None
+    lqip: Optional[str] = None
 
 class ApartmentImageForm(BaseModel):
     id_apartment: int
@@ -79,3 +84,16 @@ class UpdateApartment(BaseModel):
     parameters: List[ApartmentParameterForm] = None
     images: List[ApartmentImageForm] = None
 
+
+class CategoryFacetCount(BaseModel):
+    id_category: int
+    count: int
+
+class RoomsFacetCount(BaseModel):
+    rooms: int
+    count: int
+
+class ApartmentFacetsResponse(BaseModel):
+    total: int
+    category: List[CategoryFacetCount]
+    rooms: List[RoomsFacetCount]
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+
+BULK_MAX_ITEMS = 1000
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    message: Optional[str] = None
+
+class BulkUpdateResult(BaseModel):
+    status: str
+    updated: int
@@ -30,6 +30,11 @@ class HouseAttributeForm(BaseModel):
 class HouseImageResponse(BaseModel):
     id: int
     image: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    size: Optional[int] = None
+    dominant_color: Optional[str] = None
+    lqip: Optional[str] = None
 
 class HouseImageForm(BaseModel):
     id_house: int
@@ -90,6 +95,10 @@ class UpdateHouse(BaseModel):
     attributes: List[HouseAttributeForm] = []
     images: List[HouseImageForm] = []
 
+class BulkHouseStatus(BaseModel):
+    ids: List[int] = Field(min_length=1)
+    status: HouseStatus
+
 class ShortHouseResponse(BaseModel):
     id: int
     name: str
@@ -103,4 +112,20 @@ class ShortHouseResponse(BaseModel):
     begin_date: date
     end_date: date
     start_price: float
-    final_price: float
\ No newline at end of file
+    final_price: float
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class AttributeFacetCount(BaseModel):
+    id_attribute: int
+    value: str
+    count: int
+
+class HouseFacetsResponse(BaseModel):
+    total: int
+    status: List[FacetCount]
+    district: List[FacetCount]
+    attributes: List[AttributeFacetCount]
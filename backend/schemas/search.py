@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Literal
+
+class SearchHit(BaseModel):
+    type: Literal['house', 'apartment']
+    id: int
+    name: str
+    score: float
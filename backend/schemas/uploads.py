@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from enum import Enum
+
+class UploadTarget(str, Enum):
+    HOUSE = 'HOUSE'
+    APARTMENT = 'APARTMENT'
+
+class CreateUploadSession(BaseModel):
+    target: UploadTarget
+    id_target: int
+    filename: Optional[str] = None
+    size: int = Field(gt=0)
+    chunk_size: Optional[int] = Field(None, gt=0)
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    target: UploadTarget
+    id_target: int
+    filename: Optional[str] = None
+    size: int
+    chunk_size: int
+    chunks: int
+    # Received byte ranges, [start, end) each, merged
+    received: List[List[int]]
+    complete: bool
+
+class FinalizedUpload(BaseModel):
+    status: str
+    image: str
@@ -2,7 +2,21 @@ from utils.enums import Status
 from models.apartments import *
 from schemas.apartments import *
 from dependencies import ApartmentRepository
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, and_, or_, func, union_all
+from utils.pagination import PageParams, Page, paginate
+from utils.cache import MemoryCache, make_key, invalidates
+from utils.unit_of_work import on_commit
+from utils.reference_cache import ReferenceCache
+from utils.identity_map import IdentityMap
+from utils.bulk import insert_with_children, bulk_results
+from models.houses import House
+from utils.search import search_index, index_apartment, is_indexed_update, APARTMENT_FIELDS
+
+APARTMENT_SORT_KEYS = ('id', 'area', 'rooms')
+
+facet_cache = MemoryCache(maxsize=512)
+category_cache = ReferenceCache(ApartmentCategory)
+parameter_cache = ReferenceCache(Parameter)
 
 class ApartmentService:
     def __init__(self, apartment_repository: ApartmentRepository,
@@ -15,143 +29,252 @@ class ApartmentService:
         self.apartment_category_repository = apartment_category_repository
         self.apartment_parameter_repository = apartment_parameter_repository
         self.apartment_image_repository = apartment_image_repository
+        # Apartment rows loaded during this request; lookup tables come from the reference caches
+        self.identity_map = IdentityMap()
 
     # ApartmentCategory
-    def get_all_apartment_category_filter_by(self, **filter):
-        return self.apartment_category_repository.get_all_filter_by(**filter)
+    async def get_all_apartment_category_filter_by(self, **filter):
+        return await category_cache.get_all(self.apartment_category_repository, **filter)
     
-    def get_one_apartment_category_filter_by(self, **filter):
-        return self.apartment_category_repository.get_one_filter_by(**filter)
+    async def get_one_apartment_category_filter_by(self, **filter):
+        return await category_cache.get_one(self.apartment_category_repository, **filter)
     
-    def create_apartment_category(self, new_apartment_category: CreateApartmentCategory):
-        create_apartment_category = self.apartment_category_repository.add(new_apartment_category.model_dump())
+    @invalidates('categories')
+    async def create_apartment_category(self, new_apartment_category: CreateApartmentCategory):
+        create_apartment_category = await self.apartment_category_repository.add(new_apartment_category.model_dump())
         if not create_apartment_category:
             return Status.FAILED.value
         return create_apartment_category
     
-    def update_apartment_category(self, id: int, upd_apartment_category: UpdateApartmentCategory):
+    @invalidates('categories')
+    async def update_apartment_category(self, id: int, upd_apartment_category: UpdateApartmentCategory):
         entity = upd_apartment_category.model_dump()
         entity['id'] = id
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_apartment_category = self.apartment_category_repository.update(entity)
+        update_apartment_category = await self.apartment_category_repository.update(entity)
         if not update_apartment_category:
             return Status.FAILED.value
         return update_apartment_category
     
-    def delete_apartment_category(self, id: int):
-        return self.apartment_category_repository.delete(id)
+    @invalidates('categories')
+    async def delete_apartment_category(self, id: int):
+        return await self.apartment_category_repository.delete(id)
     
 
     # Parameter
-    def get_all_parameters_filter_by(self, **filter):
-        return self.parameter_repository.get_all_filter_by(**filter)
+    async def get_all_parameters_filter_by(self, **filter):
+        return await parameter_cache.get_all(self.parameter_repository, **filter)
     
-    def get_one_parameter_filter_by(self, **filter):
-        return self.parameter_repository.get_one_filter_by(**filter)
+    async def get_one_parameter_filter_by(self, **filter):
+        return await parameter_cache.get_one(self.parameter_repository, **filter)
     
-    def create_parameter(self, new_parameter: CreateParameter):
-        create_parameter = self.parameter_repository.add(new_parameter.model_dump())
+    @invalidates('parameters')
+    async def create_parameter(self, new_parameter: CreateParameter):
+        create_parameter = await self.parameter_repository.add(new_parameter.model_dump())
         if not create_parameter:
             return Status.FAILED.value
         return create_parameter
     
-    def update_parameter(self, id: int, upd_parameter: UpdateParameter):
+    @invalidates('parameters')
+    async def update_parameter(self, id: int, upd_parameter: UpdateParameter):
         entity = upd_parameter.model_dump()
         entity['id'] = id
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_parameter = self.parameter_repository.update(entity)
+        update_parameter = await self.parameter_repository.update(entity)
         if not update_parameter:
             return Status.FAILED.value
         return update_parameter
     
-    def delete_parameter(self, id: int):
-        self.apartment_parameter_repository.delete_by_filter(id_parameter=id)
-        return self.parameter_repository.delete(id)
+    @invalidates('parameters', 'apartments')
+    async def delete_parameter(self, id: int):
+        await self.apartment_parameter_repository.delete_by_filter(id_parameter=id)
+        return await self.parameter_repository.delete(id)
     
 
     # ApartmentParameter
-    def get_all_apartment_parameter_filter_by(self, **filter):
-        return self.apartment_parameter_repository.get_all_filter_by(**filter)
+    async def get_all_apartment_parameter_filter_by(self, **filter):
+        return await self.apartment_parameter_repository.get_all_filter_by(**filter)
     
-    def get_one_apartment_parameter_filter_by(self, **filter):
-        return self.apartment_parameter_repository.get_one_filter_by(**filter)
+    async def get_one_apartment_parameter_filter_by(self, **filter):
+        return await self.apartment_parameter_repository.get_one_filter_by(**filter)
     
-    def create_apartment_parameter(self, new_apartment_parameter: ApartmentParameterForm):
-        create_apartment_parameter = self.apartment_parameter_repository.add(new_apartment_parameter.model_dump())
+    @invalidates('apartments')
+    async def create_apartment_parameter(self, new_apartment_parameter: ApartmentParameterForm):
+        create_apartment_parameter = await self.apartment_parameter_repository.add(new_apartment_parameter.model_dump())
         if not create_apartment_parameter:
             return Status.FAILED.value
         return create_apartment_parameter
     
-    def update_apartment_parameter(self, id: int, upd_apartment_parameter: ApartmentParameterForm):
+    @invalidates('apartments')
+    async def update_apartment_parameter(self, id: int, upd_apartment_parameter: ApartmentParameterForm):
         entity = upd_apartment_parameter.model_dump()
         entity['id'] = id
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_apartment_parameter = self.apartment_parameter_repository.update(entity)
+        update_apartment_parameter = await self.apartment_parameter_repository.update(entity)
         if not update_apartment_parameter:
             return Status.FAILED.value
         return update_apartment_parameter
     
-    def delete_apartment_parameter(self, id: int):
-        return self.apartment_parameter_repository.delete(id)
+    @invalidates('apartments')
+    async def delete_apartment_parameter(self, id: int):
+        return await self.apartment_parameter_repository.delete(id)
     
 
     # ApartmentImage
-    def get_all_apartment_image_filter_by(self, **filter):
-        return self.apartment_image_repository.get_all_filter_by(**filter)
+    async def get_all_apartment_image_filter_by(self, **filter):
+        return await self.apartment_image_repository.get_all_filter_by(**filter)
     
-    def get_one_apartment_image_filter_by(self, **filter):
-        return self.apartment_image_repository.get_one_filter_by(**filter)
+    async def get_one_apartment_image_filter_by(self, **filter):
+        return await self.apartment_image_repository.get_one_filter_by(**filter)
     
-    def create_apartment_image(self, new_apartment_image: ApartmentImageForm):
-        create_apartment_image = self.apartment_image_repository.add(new_apartment_image.model_dump())
+    @invalidates('apartments')
+    async def create_apartment_image(self, new_apartment_image: ApartmentImageForm):
+        create_apartment_image = await self.apartment_image_repository.add(new_apartment_image.model_dump())
         if not create_apartment_image:
             return Status.FAILED.value
         return create_apartment_image
     
-    def update_apartment_image(self, id: int, upd_apartment_image: ApartmentImageForm):
+    @invalidates('apartments')
+    async def create_apartment_images(self, id_apartment: int, images: list[str], metadata: list[dict]):
+        # One multi-row INSERT for an upload batch; metadata from utils.derivatives.describe_images
+        await self.apartment_image_repository.add_many([{**meta, 'id_apartment': id_apartment, 'image': image}
+                                                   for image, meta in zip(images, metadata)])
+
+    @invalidates('apartments')
+    async def update_apartment_image(self, id: int, upd_apartment_image: ApartmentImageForm):
         entity = upd_apartment_image.model_dump()
         entity['id'] = id
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_apartment_image = self.apartment_image_repository.update(entity)
+        update_apartment_image = await self.apartment_image_repository.update(entity)
         if not update_apartment_image:
             return Status.FAILED.value
         return update_apartment_image
     
-    def delete_apartment_image(self, id: int):
-        return self.apartment_image_repository.delete(id)
+    @invalidates('apartments')
+    async def delete_apartment_image(self, id: int):
+        return await self.apartment_image_repository.delete(id)
 
 
     # Apartment
-    def get_all_apartments_filter_by(self, id_parameter: int = None, parameter_value: str = None, **filter):
-        query = self.apartment_repository.get_all_filter_by(**filter).options(
-            joinedload(Apartment.parameters).joinedload(ApartmentParameter.parameter))
-        if id_parameter and parameter_value:
-            query = query.join(ApartmentParameter).filter(
-                ApartmentParameter.id_parameter == id_parameter,
-                ApartmentParameter.value == parameter_value
-            )
-        apartments = query.all()
+    def _apartments_with_parameters(self, parameters: list[tuple[int, str]]):
+        # Apartments having all (id_parameter, value) pairs, see HouseService._houses_with_attributes
+        parameters = set(parameters)
+        return (select(ApartmentParameter.id_apartment)
+                .where(or_(*(and_(ApartmentParameter.id_parameter == id_parameter, ApartmentParameter.value == value)
+                             for id_parameter, value in parameters)))
+                .group_by(ApartmentParameter.id_apartment)
+                .having(func.count() == len(parameters)))
+
+    async def get_apartments_facets(self, parameters: list[tuple[int, str]] = None, ranges: dict = None, **filter) -> dict:
+        key = make_key('apartments', parameters, ranges, filter)
+        facets = facet_cache.get(key)
+        if facets is not None:
+            return facets
+
+        apartments = self._apartments_query(parameters, ranges, **filter)
+        category = (await self.apartment_repository.execute(
+            apartments.with_only_columns(Apartment.id_category, func.count()).group_by(Apartment.id_category))).all()
+        rooms = (await self.apartment_repository.execute(
+            apartments.with_only_columns(Apartment.rooms, func.count()).group_by(Apartment.rooms))).all()
+        facets = {
+            'total': sum(count for _, count in rooms),
+            'category': [{'id_category': id_category, 'count': count} for id_category, count in category],
+            'rooms': [{'rooms': value, 'count': count} for value, count in rooms],
+        }
+        facet_cache.set(key, facets, tags=['apartments'])
+        return facets
+
+    def _apartments_query(self, parameters: list[tuple[int, str]] = None, ranges: dict = None, **filter):
+        statement = self.apartment_repository.select_in_range(ranges or {}, **filter)
+        if parameters:
+            statement = statement.where(Apartment.id.in_(self._apartments_with_parameters(parameters)))
+        return statement
+
+    async def get_all_apartments_filter_by(self, parameters: list[tuple[int, str]] = None, ranges: dict = None, **filter):
+        apartments = await self.apartment_repository.all(self._apartments_query(parameters, ranges, **filter))
         return apartments
+
+    async def get_apartments_page(self, page: PageParams, parameters: list[tuple[int, str]] = None,
+                            ranges: dict = None, **filter) -> Page:
+        statement = self._apartments_query(parameters, ranges, **filter)
+        return await paginate(self.apartment_repository, statement, page, sortable=APARTMENT_SORT_KEYS)
     
-    def get_one_apartment_filter_by(self, **filter):
-        return self.apartment_repository.get_one_filter_by(**filter)
+    async def get_one_apartment_filter_by(self, **filter):
+        if set(filter) == {'id'}:
+            return await self.identity_map.get_one(self.apartment_repository, filter['id'])
+        return await self.apartment_repository.get_one_filter_by(**filter)
+
+    async def get_apartments_by_ids(self, ids) -> dict:
+        return await self.identity_map.get_many(self.apartment_repository, ids)
+
+    async def get_apartments_relations(self, apartments) -> dict:
+        # One IN query per related table instead of one query per apartment and relation.
+        # Returns {id_apartment: (category, [(parameter, value), ...], [image, ...])}
+        ids = [apartment.id for apartment in apartments]
+        categories = await category_cache.get_many(self.apartment_category_repository,
+                                             {apartment.id_category for apartment in apartments})
+        parameter_assoc = await self.apartment_parameter_repository.get_many_by_ids(ids, key='id_apartment')
+        parameters = await parameter_cache.get_many(self.parameter_repository,
+                                              {param_assoc.id_parameter for param_assoc in parameter_assoc})
+        images = await self.apartment_image_repository.get_many_by_ids(ids, key='id_apartment')
+
+        relations = {apartment.id: (categories.get(apartment.id_category), [], []) for apartment in apartments}
+        for param_assoc in parameter_assoc:
+            relations[param_assoc.id_apartment][1].append((parameters[param_assoc.id_parameter], param_assoc.value))
+        for image in images:
+            relations[image.id_apartment][2].append(image)
+        return relations
     
-    def create_apartment(self, new_apartment: CreateApartment):
+    @invalidates('apartments')
+    async def create_apartment(self, new_apartment: CreateApartment):
         new_apartment_dict = new_apartment.model_dump()
         parameters = new_apartment_dict.pop('parameters') or []
 
-        create_apartment = self.apartment_repository.add(new_apartment_dict)
+        create_apartment = await self.apartment_repository.add(new_apartment_dict)
         if not new_apartment:
             return Status.FAILED.value
         
-        if parameters:
-            for parameter in parameters:
-                parameter['id_apartment'] = create_apartment.id
-                self.apartment_parameter_repository.add(parameter)
-        
+        await self.apartment_parameter_repository.add_many([{**parameter, 'id_apartment': create_apartment.id}
+                                                            for parameter in parameters])
+        on_commit(lambda: index_apartment(create_apartment))
         return create_apartment
     
-    def update_apartment(self, id: int, upd_apartment: UpdateApartment):
+    @invalidates('apartments')
+    async def create_apartments_bulk(self, new_apartments: list[CreateApartment]) -> list[dict]:
+        # Referenced rows are checked in one pass: categories and parameters from
+        # the reference cache, houses with one IN query
+        categories = await category_cache.rows(self.apartment_category_repository)
+        parameters = await parameter_cache.rows(self.parameter_repository)
+        ids_houses = set((await self.apartment_repository.execute(
+            select(House.id).where(House.id.in_({apartment.id_house for apartment in new_apartments})))).scalars())
+
+        results, valid = {}, []
+        for index, new_apartment in enumerate(new_apartments):
+            apartment = new_apartment.model_dump()
+            apartment_parameters = apartment.pop('parameters', []) or []
+            ids = [parameter['id_parameter'] for parameter in apartment_parameters]
+            unknown = sorted(set(ids) - parameters.keys())
+            if apartment['id_house'] not in ids_houses:
+                results[index] = f'Unknown house: {apartment["id_house"]}'
+            elif apartment['id_category'] not in categories:
+                results[index] = f'Unknown category: {apartment["id_category"]}'
+            elif unknown:
+                results[index] = f'Unknown parameters: {unknown}'
+            elif len(ids) != len(set(ids)):
+                results[index] = 'Duplicate parameters'
+            else:
+                valid.append((index, apartment, apartment_parameters))
+
+        results.update(await insert_with_children(self.apartment_repository, self.apartment_parameter_repository,
+                                                  valid, foreign_key='id_apartment'))
+        for result in results.values():
+            if not isinstance(result, str):
+                on_commit(lambda apartment=result: index_apartment(apartment))
+        return bulk_results(results, len(new_apartments))
+
+    @invalidates('apartments')
+    async def update_apartment(self, id: int, upd_apartment: UpdateApartment, replace_parameters: bool = False):
+        # replace_parameters: parameters left out of upd_apartment.parameters are deleted
         entity = upd_apartment.model_dump()
         entity['id'] = id
 
@@ -159,29 +282,41 @@ class ApartmentService:
         images = entity.pop('images') or []
 
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_apartment = self.apartment_repository.update(entity)
+        # Parameter-only edits skip the no-op UPDATE of the row itself
+        update_apartment = await self.apartment_repository.update(entity) if len(entity) > 1 else entity
         if not update_apartment:
             return Status.FAILED.value
         
-        if parameters:
-            existing_parameters = self.apartment_parameter_repository.get_all_filter_by(id_apartment=id)
-            existing_parameters_dict = {p.id_parameter: p for p in existing_parameters}
-            for parameter in parameters:
-                id_parameter = parameter['id_parameter']
-                value = parameter['value']
-
-                if id_parameter in existing_parameters_dict:
-                    self.apartment_parameter_repository.update_by_filter(
-                        {'id_apartment': id, 'id_parameter': id_parameter},
-                        {'value': value})
-                else:
-                    parameter['id_apartment'] = id
-                    self.apartment_parameter_repository.add(parameter)
+        await self.apartment_parameter_repository.upsert([{**parameter, 'id_apartment': id} for parameter in parameters],
+                                                         update_columns=('value',))
+        if replace_parameters and 'parameters' in upd_apartment.model_fields_set:
+            await self.apartment_parameter_repository.delete_except(
+                'id_parameter', [parameter['id_parameter'] for parameter in parameters], id_apartment=id)
+        if is_indexed_update(entity, APARTMENT_FIELDS):
+            apartment = await self.apartment_repository.get_one_filter_by(id=id)
+            on_commit(lambda: index_apartment(apartment))
         return update_apartment
     
-    def delete_apartment(self, id: int):
-        self.apartment_parameter_repository.delete_by_filter(id_apartment=id)
-        self.apartment_image_repository.delete_by_filter(id_apartment=id)
-        return self.apartment_repository.delete(id)
+    @invalidates('apartments')
+    async def delete_apartment(self, id: int):
+        return await self.delete_apartments(id=id)
+
+    @invalidates('apartments')
+    async def delete_apartments(self, **filter) -> list[str]:
+        # Deletes the matching apartments with their parameters and images in a few
+        # set-based statements; returns the image files they referenced
+        ids = (await self.apartment_repository.execute(
+            self.apartment_repository.select_filter_by(**filter).with_only_columns(Apartment.id))).scalars().all()
+        if not ids:
+            return []
+        images = (await self.apartment_repository.execute(union_all(
+            select(Apartment.main_image).where(Apartment.id.in_(ids)),
+            select(ApartmentImage.image).where(ApartmentImage.id_apartment.in_(ids))))).scalars().all()
+
+        await self.apartment_parameter_repository.delete_where(ApartmentParameter.id_apartment.in_(ids))
+        await self.apartment_image_repository.delete_where(ApartmentImage.id_apartment.in_(ids))
+        await self.apartment_repository.delete_where(Apartment.id.in_(ids))
+        on_commit(lambda: [search_index.remove('apartment', id) for id in ids])
+        return images
 
 
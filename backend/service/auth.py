@@ -14,12 +14,12 @@ class AuthService:
     def __init__(self, user_repository: UserRepository):
         self.user_repository = user_repository
 
-    def create_user(self, user: UserCreate):
+    async def create_user(self, user: UserCreate):
         user.password = pbkdf2_sha256.hash(user.password)
-        return self.user_repository.add(user.model_dump())
+        return await self.user_repository.add(user.model_dump())
 
-    def get_user_filter_by(self, **filter_by):
-        return self.user_repository.get_one_filter_by(**filter_by)
+    async def get_user_filter_by(self, **filter_by):
+        return await self.user_repository.get_one_filter_by(**filter_by)
 
 
     def gen_token(self, user: User):
@@ -36,9 +36,9 @@ class AuthService:
         except jwt.InvalidTokenError:
             raise HTTPException(status_code=401, detail={'status': AuthStatus.INVALID_TOKEN.value})
 
-    def get_user_by_token(self, token: str):
+    async def get_user_by_token(self, token: str):
         payload = self.decode_token(token)
-        user = self.get_user_filter_by(id=payload['sub'])
+        user = await self.get_user_filter_by(id=payload['sub'])
         if not user:
             raise HTTPException(status_code=401, detail={'status': AuthStatus.USER_NOT_FOUND.value})
         return user
@@ -47,8 +47,8 @@ class AuthService:
         payload = {"sub": user.id, "exp": datetime.now() + UPDATE_EXPIRATION_TIME}
         return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
     
-    def login(self, user_login: UserLogin):
-        user = self.get_user_filter_by(email=user_login.email)
+    async def login(self, user_login: UserLogin):
+        user = await self.get_user_filter_by(email=user_login.email)
         if not user:
             raise HTTPException(status_code=401, detail={'status': AuthStatus.INVALID_EMAIL_OR_PASSWORD.value})
         if not pbkdf2_sha256.verify(user_login.password, user.password):
@@ -60,9 +60,9 @@ class AuthService:
             'expires': EXPIRATION_TIME.total_seconds()
         }, self.gen_update_token(user)
 
-    def refresh_token(self, token: str):
+    async def refresh_token(self, token: str):
         payload = self.decode_token(token)
-        user = self.get_user_filter_by(id=payload['sub'])
+        user = await self.get_user_filter_by(id=payload['sub'])
         if not user:
             raise HTTPException(status_code=401, detail={'status': AuthStatus.USER_NOT_FOUND.value})
         token = self.gen_token(user)
@@ -1,9 +1,22 @@
-from utils.abstract_repository import IREpository
 from dependencies import HouseRepository
 from schemas.houses import *
 from utils.enums import Status
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, and_, or_, func, union_all
+from sqlalchemy.orm import joinedload, selectinload
 from models.houses import *
+from models.apartments import Apartment, ApartmentParameter
+from utils.identity_map import IdentityMap
+from utils.pagination import PageParams, Page, paginate
+from utils.cache import MemoryCache, make_key, invalidates
+from utils.unit_of_work import on_commit
+from utils.reference_cache import ReferenceCache
+from utils.bulk import insert_with_children, bulk_results
+from utils.search import search_index, index_house, is_indexed_update, HOUSE_FIELDS
+
+HOUSE_SORT_KEYS = ('id', 'start_price', 'begin_date')
+
+facet_cache = MemoryCache(maxsize=512)
+attribute_cache = ReferenceCache(Attribute)
 
 class HouseService:
     def __init__(self, house_repository: HouseRepository,
@@ -14,117 +27,223 @@ class HouseService:
         self.attribute_repository = attribute_repository
         self.house_attribute_repository = house_attribute_repository
         self.house_image_repository = house_image_repository
+        self.identity_map = IdentityMap()
 
     # Attribute
-    def get_all_attributes_filter_by(self, **filter):
-        return self.attribute_repository.get_all_filter_by(**filter)
+    async def get_all_attributes_filter_by(self, **filter):
+        return await attribute_cache.get_all(self.attribute_repository, **filter)
     
-    def get_one_attribute_filter_by(self, **filter):
-        return self.attribute_repository.get_one_filter_by(**filter)
+    async def get_one_attribute_filter_by(self, **filter):
+        return await attribute_cache.get_one(self.attribute_repository, **filter)
     
-    def create_attribute(self, new_attribute: CreateAttribute):
-        create_attribute = self.attribute_repository.add(new_attribute.model_dump())
+    @invalidates('attributes')
+    async def create_attribute(self, new_attribute: CreateAttribute):
+        create_attribute = await self.attribute_repository.add(new_attribute.model_dump())
         if not create_attribute:
             return Status.FAILED.value
         return create_attribute
     
-    def update_attribute(self, id: int, upd_attribute: UpdateAttribute):
+    @invalidates('attributes')
+    async def update_attribute(self, id: int, upd_attribute: UpdateAttribute):
         entity = upd_attribute.model_dump()
         entity['id'] = id
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_attribute = self.attribute_repository.update(entity)
+        update_attribute = await self.attribute_repository.update(entity)
         if not update_attribute:
             return Status.FAILED.value
         return update_attribute
     
-    def delete_attribute(self, id: int):
-        self.house_attribute_repository.delete_by_filter(id_attribute=id)
-        return self.attribute_repository.delete(id)
+    @invalidates('attributes', 'houses')
+    async def delete_attribute(self, id: int):
+        await self.house_attribute_repository.delete_by_filter(id_attribute=id)
+        return await self.attribute_repository.delete(id)
     
     
     # HouseAttribute
-    def get_all_house_attribute_filter_by(self, **filter):
-        return self.house_attribute_repository.get_all_filter_by(**filter)
+    async def get_all_house_attribute_filter_by(self, **filter):
+        return await self.house_attribute_repository.get_all_filter_by(**filter)
     
-    def get_one_house_attribute_filter_by(self, **filter):
-        return self.house_attribute_repository.get_one_filter_by(**filter)
+    async def get_one_house_attribute_filter_by(self, **filter):
+        return await self.house_attribute_repository.get_one_filter_by(**filter)
     
-    def create_house_attribute(self, new_house_attribute: HouseAttributeForm):
-        create_house_attribute = self.house_attribute_repository.add(new_house_attribute.model_dump())
+    @invalidates('houses')
+    async def create_house_attribute(self, new_house_attribute: HouseAttributeForm):
+        create_house_attribute = await self.house_attribute_repository.add(new_house_attribute.model_dump())
         if not create_house_attribute:
             return Status.FAILED.value
         return create_house_attribute
     
-    def update_house_attribute(self, id: int, upd_house_attribute: HouseAttributeForm):
+    @invalidates('houses')
+    async def update_house_attribute(self, id: int, upd_house_attribute: HouseAttributeForm):
         entity = upd_house_attribute.model_dump()
         entity['id'] = id
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_house_attribute = self.house_attribute_repository.update(entity)
+        update_house_attribute = await self.house_attribute_repository.update(entity)
         if not update_house_attribute:
             return Status.FAILED.value
         return update_house_attribute
     
-    def delete_house_attribute(self, id: int):
-        return self.house_attribute_repository.delete(id)
+    @invalidates('houses')
+    async def delete_house_attribute(self, id: int):
+        return await self.house_attribute_repository.delete(id)
     
 
     # HouseImage
-    def get_all_house_image_filter_by(self, **filter):
-        return self.house_image_repository.get_all_filter_by(**filter)
+    async def get_all_house_image_filter_by(self, **filter):
+        return await self.house_image_repository.get_all_filter_by(**filter)
     
-    def get_one_house_image_filter_by(self, **filter):
-        return self.house_image_repository.get_one_filter_by(**filter)
+    async def get_one_house_image_filter_by(self, **filter):
+        return await self.house_image_repository.get_one_filter_by(**filter)
     
-    def create_house_image(self, new_house_image: HouseImageForm):
-        create_house_image = self.house_image_repository.add(new_house_image.model_dump())
+    @invalidates('houses')
+    async def create_house_image(self, new_house_image: HouseImageForm):
+        create_house_image = await self.house_image_repository.add(new_house_image.model_dump())
         if not create_house_image:
             return Status.FAILED.value
         return create_house_image
     
-    def update_house_image(self, id: int, upd_house_image: HouseImageForm):
+    @invalidates('houses')
+    async def create_house_images(self, id_house: int, images: list[str], metadata: list[dict]):
+        # One multi-row INSERT for an upload batch; metadata from utils.derivatives.describe_images
+        await self.house_image_repository.add_many([{**meta, 'id_house': id_house, 'image': image}
+                                                   for image, meta in zip(images, metadata)])
+
+    @invalidates('houses')
+    async def update_house_image(self, id: int, upd_house_image: HouseImageForm):
         entity = upd_house_image.model_dump()
         entity['id'] = id
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_house_image = self.house_image_repository.update(entity)
+        update_house_image = await self.house_image_repository.update(entity)
         if not update_house_image:
             return Status.FAILED.value
         return update_house_image
     
-    def delete_house_image(self, id: int):
-        return self.house_image_repository.delete(id)
+    @invalidates('houses')
+    async def delete_house_image(self, id: int):
+        return await self.house_image_repository.delete(id)
 
 
     # House
-    def get_all_houses_filter_by(self, id_attribute: int, attribute_value: str, **filter):
-        query = self.house_repository.get_all_filter_by(**filter).options(
-            joinedload(House.attributes).joinedload(HouseAttribute.attribute),
+    def _with_tree(self, statement):
+        # Loads House -> images/attributes -> apartments -> category/parameters/images
+        # with one SELECT ... IN per relation, independent of the number of houses
+        return statement.options(
+            selectinload(House.images),
+            selectinload(House.attributes).joinedload(HouseAttribute.attribute),
+            selectinload(House.apartments).options(
+                joinedload(Apartment.category),
+                selectinload(Apartment.parameters).joinedload(ApartmentParameter.parameter),
+                selectinload(Apartment.images),
+            ),
         )
-        if id_attribute and attribute_value:
-            query = query.join(HouseAttribute).filter(
-                HouseAttribute.id_attribute == id_attribute,
-                HouseAttribute.value == attribute_value
-            )
-        houses = query.all()
+
+    def _houses_with_attributes(self, attributes: list[tuple[int, str]]):
+        # Houses having all (id_attribute, value) pairs: one grouped pass over
+        # the (id_attribute, value, id_house) index, each predicate narrows the set
+        attributes = set(attributes)
+        return (select(HouseAttribute.id_house)
+                .where(or_(*(and_(HouseAttribute.id_attribute == id_attribute, HouseAttribute.value == value)
+                             for id_attribute, value in attributes)))
+                .group_by(HouseAttribute.id_house)
+                .having(func.count() == len(attributes)))
+
+    def _filtered_houses(self, attributes: list[tuple[int, str]] = None, ranges: dict = None, **filter):
+        statement = self.house_repository.select_in_range(ranges or {}, **filter)
+        if attributes:
+            statement = statement.where(House.id.in_(self._houses_with_attributes(attributes)))
+        return statement
+
+    def _houses_query(self, attributes: list[tuple[int, str]] = None, ranges: dict = None, **filter):
+        return self._with_tree(self._filtered_houses(attributes, ranges, **filter))
+
+    async def get_all_houses_filter_by(self, attributes: list[tuple[int, str]] = None, ranges: dict = None, **filter):
+        houses = await self.house_repository.all(self._houses_query(attributes, ranges, **filter))
         return houses
+
+    async def get_houses_page(self, page: PageParams, attributes: list[tuple[int, str]] = None,
+                        ranges: dict = None, **filter) -> Page:
+        statement = self._houses_query(attributes, ranges, **filter)
+        return await paginate(self.house_repository, statement, page, sortable=HOUSE_SORT_KEYS)
     
-    def get_one_house_filter_by(self, **filter):
-        return self.house_repository.get_one_filter_by(**filter)
+    async def get_houses_facets(self, attributes: list[tuple[int, str]] = None, ranges: dict = None, **filter) -> dict:
+        key = make_key('houses', attributes, ranges, filter)
+        facets = facet_cache.get(key)
+        if facets is not None:
+            return facets
+
+        houses = self._filtered_houses(attributes, ranges, **filter)
+        status = (await self.house_repository.execute(
+            houses.with_only_columns(House.status, func.count()).group_by(House.status))).all()
+        district = (await self.house_repository.execute(
+            houses.with_only_columns(House.district, func.count()).group_by(House.district))).all()
+        attribute_counts = (await self.house_attribute_repository.execute(
+            select(HouseAttribute.id_attribute, HouseAttribute.value, func.count())
+            .where(HouseAttribute.id_house.in_(houses.with_only_columns(House.id)))
+            .group_by(HouseAttribute.id_attribute, HouseAttribute.value))).all()
+        facets = {
+            'total': sum(count for _, count in status),
+            'status': [{'value': value, 'count': count} for value, count in status],
+            'district': [{'value': value, 'count': count} for value, count in district],
+            'attributes': [{'id_attribute': id_attribute, 'value': value, 'count': count}
+                           for id_attribute, value, count in attribute_counts],
+        }
+        facet_cache.set(key, facets, tags=['houses'])
+        return facets
+
+    async def get_one_house_filter_by(self, **filter):
+        return await self.house_repository.get_one_filter_by(**filter)
+
+    async def get_houses_by_ids(self, ids) -> dict:
+        return await self.identity_map.get_many(self.house_repository, ids)
+
+    async def get_one_house_tree_filter_by(self, **filter):
+        return await self.house_repository.first(self._with_tree(self.house_repository.select_filter_by(**filter)))
     
-    def create_house(self, new_house: CreateHouse):
+    @invalidates('houses')
+    async def create_house(self, new_house: CreateHouse):
         new_house_dict = new_house.model_dump()
         attributes = new_house_dict.pop('attributes', []) or []
 
-        create_house = self.house_repository.add(new_house_dict)
+        create_house = await self.house_repository.add(new_house_dict)
         if not create_house:
             return Status.FAILED.value
         
-        if attributes:
-            for attribute in attributes:
-                attribute['id_house'] = create_house.id
-                self.house_attribute_repository.add(attribute)
+        await self.house_attribute_repository.add_many([{**attribute, 'id_house': create_house.id}
+                                                        for attribute in attributes])
+        on_commit(lambda: index_house(create_house))
         return create_house
     
-    def update_house(self, id: int, upd_house: UpdateHouse):
+    @invalidates('houses')
+    async def create_houses_bulk(self, new_houses: list[CreateHouse]) -> list[dict]:
+        # Referenced attributes are checked against the reference cache, in one pass
+        attributes = await attribute_cache.rows(self.attribute_repository)
+        results, valid = {}, []
+        for index, new_house in enumerate(new_houses):
+            house = new_house.model_dump()
+            house_attributes = house.pop('attributes', []) or []
+            ids = [attribute['id_attribute'] for attribute in house_attributes]
+            unknown = sorted(set(ids) - attributes.keys())
+            if unknown:
+                results[index] = f'Unknown attributes: {unknown}'
+            elif len(ids) != len(set(ids)):
+                results[index] = 'Duplicate attributes'
+            else:
+                valid.append((index, house, house_attributes))
+
+        results.update(await insert_with_children(self.house_repository, self.house_attribute_repository,
+                                                  valid, foreign_key='id_house'))
+        for result in results.values():
+            if not isinstance(result, str):
+                on_commit(lambda house=result: index_house(house))
+        return bulk_results(results, len(new_houses))
+
+    @invalidates('houses')
+    async def update_houses_status(self, ids: list[int], status: HouseStatus) -> int:
+        return await self.house_repository.update_many_by_ids(ids, {'status': status.value})
+
+    @invalidates('houses')
+    async def update_house(self, id: int, upd_house: UpdateHouse, replace_attributes: bool = False):
+        # replace_attributes: attributes left out of upd_house.attributes are deleted
         entity = upd_house.model_dump()
         entity['id'] = id
 
@@ -132,28 +251,34 @@ class HouseService:
         images = entity.pop('images', []) or []
 
         entity = {k: v for k, v in entity.items() if v is not None}
-        update_house = self.house_repository.update(entity)
+        # Attribute-only edits skip the no-op UPDATE of the row itself
+        update_house = await self.house_repository.update(entity) if len(entity) > 1 else entity
         if not update_house:
             return Status.FAILED.value
         
-        if attributes:
-            existing_attributes = self.house_attribute_repository.get_all_filter_by(id_house=id)
-            existing_attributes_dict = {attr.id_attribute: attr for attr in existing_attributes}
-            for attribute in attributes:
-                id_attribute = attribute['id_attribute']
-                value = attribute['value']
-                if id_attribute in existing_attributes_dict:
-                    print('update_by_filter:', {'id_house': id, 'id_attribute': id_attribute}, {'value': value})
-                    self.house_attribute_repository.update_by_filter(
-                        {'id_house': id, 'id_attribute': id_attribute},
-                        {'value': value}
-                    )
-                else:
-                    attribute['id_house'] = id
-                    self.house_attribute_repository.add(attribute)
+        await self.house_attribute_repository.upsert([{**attribute, 'id_house': id} for attribute in attributes],
+                                                     update_columns=('value',))
+        if replace_attributes and 'attributes' in upd_house.model_fields_set:
+            await self.house_attribute_repository.delete_except(
+                'id_attribute', [attribute['id_attribute'] for attribute in attributes], id_house=id)
+        if is_indexed_update(entity, HOUSE_FIELDS):
+            house = await self.house_repository.get_one_filter_by(id=id)
+            on_commit(lambda: index_house(house))
         return update_house
     
-    def delete_house(self, id: int):
-        self.house_attribute_repository.delete_by_filter(id_house=id)
-        self.house_image_repository.delete_by_filter(id_house=id)
-        return self.house_repository.delete(id)
+    @invalidates('houses')
+    async def delete_house(self, id: int) -> list[str]:
+        # Apartments are deleted by ApartmentService.delete_apartments beforehand;
+        # returns the image files the house referenced
+        images = (await self.house_repository.execute(union_all(
+            select(House.main_image).where(House.id == id),
+            select(HouseImage.image).where(HouseImage.id_house == id)))).scalars().all()
+        # Apartments still left (callers normally delete them first) leave the index too
+        ids_apartments = (await self.house_repository.execute(
+            select(Apartment.id).where(Apartment.id_house == id))).scalars().all()
+        await self.house_attribute_repository.delete_by_filter(id_house=id)
+        await self.house_image_repository.delete_by_filter(id_house=id)
+        await self.house_repository.delete(id)
+        on_commit(lambda: [search_index.remove('house', id),
+                           *(search_index.remove('apartment', id_apartment) for id_apartment in ids_apartments)])
+        return images
@@ -3,29 +3,42 @@ from fastapi import HTTPException
 from passlib.hash import pbkdf2_sha256
 from schemas.users import UserCreate, UserUpdate
 from crud.users import UserRepository
+from utils.identity_map import IdentityMap
+from utils.pagination import PageParams, Page, paginate
+from models.users import User
+
+USER_SORT_KEYS = ('id', 'name')
 
 class UserService:
     def __init__(self, user_repository: UserRepository):
         self.user_repository = user_repository
+        self.identity_map = IdentityMap()
 
-    def get_all_users_filter_by(self, **filter):
-        users = self.user_repository.get_all_filter_by(**filter)
+    async def get_all_users_filter_by(self, **filter):
+        users = await self.user_repository.get_all_filter_by(**filter)
         return users
 
-    def get_user_filter_by(self, **filter):
-        user = self.user_repository.get_one_filter_by(**filter)
+    async def get_users_page(self, page: PageParams, **filter) -> Page:
+        statement = self.user_repository.select_filter_by(**filter)
+        return await paginate(self.user_repository, statement, page, sortable=USER_SORT_KEYS)
+
+    async def get_user_filter_by(self, **filter):
+        user = await self.user_repository.get_one_filter_by(**filter)
         return user
 
-    def update(self, user_id: int, data: UserUpdate):
+    async def get_users_by_ids(self, ids) -> dict:
+        return await self.identity_map.get_many(self.user_repository, ids)
+
+    async def update(self, user_id: int, data: UserUpdate):
         entity = data.model_dump()
-        user = self.user_repository.get_one_filter_by(id=user_id)
+        user = await self.user_repository.get_one_filter_by(id=user_id)
         if data.password and not pbkdf2_sha256.verify(data.password, user.password):
             raise HTTPException(status_code=403, detail={'status': AuthStatus.INVALID_PASSWORD.value})
         if data.password:
             entity['password'] = pbkdf2_sha256.hash(data.password)
-        self.user_repository.update(user_id, entity)
-        updated_user = self.user_repository.get_one_filter_by(id=user_id)
+        await self.user_repository.update(user_id, entity)
+        updated_user = await self.user_repository.get_one_filter_by(id=user_id)
         return updated_user
 
-    def delete_user(self, user_id: int):
-        return self.user_repository.delete(user_id)
\ No newline at end of file
+    async def delete_user(self, user_id: int):
+        return await self.user_repository.delete(user_id)
\ No newline at end of file
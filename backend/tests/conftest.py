@@ -0,0 +1,101 @@
+import os
+import tempfile
+
+# config/* read the environment at import time, so it is set before any app import
+_workdir = tempfile.mkdtemp()
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-with-enough-bytes-for-hs256')
+os.environ['ASYNC_DATABASE_URL'] = f'sqlite+aiosqlite:///{_workdir}/test.db'
+os.environ['IMAGE_DIR'] = os.path.join(_workdir, 'images')
+# No version polls in the middle of a counted request
+os.environ['TABLE_VERSIONS_POLL_INTERVAL'] = '3600'
+os.environ['TABLE_VERSIONS_MAX_LAG'] = '3600'
+os.makedirs(os.environ['IMAGE_DIR'])
+
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, event
+from sqlalchemy.orm import sessionmaker
+from config.database import Base, async_engine
+from main import app
+from models import *
+from service.apartments import category_cache, parameter_cache, facet_cache as apartment_facet_cache
+from service.auth import AuthService
+from service.houses import attribute_cache, facet_cache as house_facet_cache
+from utils.response_cache import response_cache
+from utils.search import search_index
+
+engine = create_engine(f'sqlite:///{_workdir}/test.db')
+Base.metadata.create_all(engine)
+Session = sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture(scope='session')
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    session = Session()
+    yield session
+    session.close()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name != TableVersion.__tablename__:
+                connection.execute(delete(table))
+    for cache in (response_cache, category_cache, parameter_cache, attribute_cache,
+                  house_facet_cache, apartment_facet_cache):
+        cache.clear()
+    search_index.clear()
+
+
+@pytest.fixture
+def statements():
+    """SQL statements run by the API while the test runs."""
+    executed = []
+
+    def count(connection, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', count)
+    yield executed
+    event.remove(async_engine.sync_engine, 'before_cursor_execute', count)
+
+
+def seed_houses(db, count: int, apartments: int = 2):
+    """Houses with attributes, images, apartments and an order each."""
+    category = db.query(ApartmentCategory).first() or ApartmentCategory(name='studio')
+    parameter = db.query(Parameter).first() or Parameter(name='balcony')
+    attribute = db.query(Attribute).first() or Attribute(name='material', description='Материал стен')
+    user = db.query(User).first() or User(name='admin', email='admin@example.com', password='x', role='ADMIN')
+    db.add_all([category, parameter, attribute, user])
+    db.flush()
+    start = db.query(House).count()
+    for number in range(start, start + count):
+        house = House(name=f'Дом {number}', description='Кирпичный дом', status='FOR_SALE', is_order=False,
+                      district='Центр', address=f'ул. Речная, {number}', floors=5, entrances=2,
+                      begin_date=date(2024, 1, 1), end_date=date(2025, 1, 1), start_price=100 + number,
+                      final_price=200 + number)
+        db.add(house)
+        db.flush()
+        db.add(HouseAttribute(id_house=house.id, id_attribute=attribute.id, value='кирпич'))
+        db.add(HouseImage(id_house=house.id, image='placeholder.png'))
+        for room in range(apartments):
+            apartment = Apartment(name=f'Квартира {number}-{room}', description='Светлая', id_category=category.id,
+                                  rooms=room + 1, area=30 + room, id_house=house.id, count=1)
+            db.add(apartment)
+            db.flush()
+            db.add(ApartmentParameter(id_apartment=apartment.id, id_parameter=parameter.id, value='есть'))
+            db.add(ApartmentImage(id_apartment=apartment.id, image='placeholder.png'))
+        db.add(Order(id_user=user.id, id_house=house.id, status='PENDING', contract_price=100,
+                     create_date=date(2024, 1, 1)))
+    db.commit()
+
+
+@pytest.fixture
+def admin_headers(db) -> dict:
+    seed_houses(db, 0)
+    token = AuthService(None).gen_token(db.query(User).filter_by(role='ADMIN').first())
+    return {'Authorization': f'Bearer {token}'}
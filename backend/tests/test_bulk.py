@@ -0,0 +1,42 @@
+"""Bulk create inserts the valid rows in a fixed number of statements and
+reports the rejected ones by their index."""
+from conftest import seed_houses
+from models.houses import House, HouseAttribute
+
+
+def new_house(name: str, attributes: list[int]) -> dict:
+    return {'name': name, 'description': 'Панельный дом', 'status': 'FOR_SALE', 'is_order': False,
+            'district': 'Центр', 'address': 'ул. Речная, 1', 'floors': 9, 'entrances': 3,
+            'begin_date': '2024-01-01', 'end_date': '2025-01-01', 'start_price': 100, 'final_price': 200,
+            'attributes': [{'id_attribute': id, 'value': 'кирпич'} for id in attributes]}
+
+
+def post_bulk(client, statements, houses: list[dict]) -> tuple[list[dict], int]:
+    statements.clear()
+    response = client.post('/api/houses/bulk', json=houses)
+    assert response.status_code == 200, response.text
+    return response.json(), sum(statement.startswith('INSERT') for statement in statements)
+
+
+def test_bulk_reports_failed_rows_and_commits_the_rest(client, db, statements):
+    seed_houses(db, 0)
+    results, _ = post_bulk(client, statements, [new_house('Первый', [1]), new_house('Неизвестный', [99]),
+                                                new_house('Повтор', [1, 1]), new_house('Второй', [])])
+
+    assert [(result['index'], result['status']) for result in results] == \
+        [(0, 'SUCCESS'), (1, 'FAILED'), (2, 'FAILED'), (3, 'SUCCESS')]
+    assert results[1]['message'] == 'Unknown attributes: [99]'
+    assert results[2]['message'] == 'Duplicate attributes'
+    created = {house.id: house.name for house in db.query(House)}
+    assert created == {results[0]['id']: 'Первый', results[3]['id']: 'Второй'}
+    assert [row.id_house for row in db.query(HouseAttribute)] == [results[0]['id']]
+
+
+def test_bulk_insert_count_does_not_depend_on_batch_size(client, db, statements):
+    seed_houses(db, 0)
+    _, few = post_bulk(client, statements, [new_house(f'Дом {n}', [1]) for n in range(2)])
+    results, many = post_bulk(client, statements, [new_house(f'Дом {n}', [1]) for n in range(20)])
+
+    assert {result['status'] for result in results} == {'SUCCESS'}
+    assert few == many == 2
+    assert db.query(House).count() == 22
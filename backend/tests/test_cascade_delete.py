@@ -0,0 +1,35 @@
+"""Deleting a house removes its whole tree and hands every image file it
+referenced to the cleanup after commit."""
+from conftest import seed_houses
+from models.apartments import Apartment, ApartmentImage, ApartmentParameter
+from models.houses import House, HouseAttribute, HouseImage
+import routers.houses
+
+
+def test_cascade_delete_returns_image_names(client, db, monkeypatch):
+    seed_houses(db, 2, apartments=2)
+    db.query(House).filter_by(id=1).update({'main_image': 'house-main.png'})
+    db.query(HouseImage).filter_by(id_house=1).update({'image': 'house-1.png'})
+    for apartment in db.query(Apartment).filter_by(id_house=1):
+        apartment.main_image = f'apartment-{apartment.id}-main.png'
+        db.query(ApartmentImage).filter_by(id_apartment=apartment.id).update({'image': f'apartment-{apartment.id}.png'})
+    db.commit()
+    ids_apartments = [apartment.id for apartment in db.query(Apartment).filter_by(id_house=1)]
+    released = []
+    monkeypatch.setattr(routers.houses, 'release_images', lambda images: released.extend(images))
+
+    assert client.delete('/api/houses/1').status_code == 200
+
+    assert sorted(filter(None, released)) == sorted(
+        ['house-main.png', 'house-1.png',
+         *(f'apartment-{id}-main.png' for id in ids_apartments), *(f'apartment-{id}.png' for id in ids_apartments)])
+    db.expire_all()
+    assert db.query(House).filter_by(id=1).count() == 0
+    assert db.query(HouseAttribute).filter_by(id_house=1).count() == 0
+    assert db.query(HouseImage).filter_by(id_house=1).count() == 0
+    assert db.query(Apartment).filter_by(id_house=1).count() == 0
+    assert db.query(ApartmentParameter).filter(ApartmentParameter.id_apartment.in_(ids_apartments)).count() == 0
+    assert db.query(ApartmentImage).filter(ApartmentImage.id_apartment.in_(ids_apartments)).count() == 0
+    # The other house is untouched
+    assert db.query(Apartment).filter_by(id_house=2).count() == 2
+    assert db.query(HouseImage).filter_by(id_house=2).count() == 1
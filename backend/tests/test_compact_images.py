@@ -0,0 +1,52 @@
+"""compact_images.py: an interrupted run resumes from its journal without
+encoding anything twice."""
+import argparse
+import io
+import os
+import pytest
+from PIL import Image
+from conftest import seed_houses
+from models.houses import HouseImage
+import compact_images
+
+
+def args() -> argparse.Namespace:
+    return argparse.Namespace(format='webp', quality=80, max_size=64, min_bytes=0, workers=2, dry_run=False)
+
+
+def test_compaction_resumes_after_interruption(client, db, admin_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(compact_images, 'IMAGE_COMPACT_JOURNAL', str(tmp_path / 'journal.jsonl'))
+    seed_houses(db, 1, apartments=0)
+    for _ in range(2):
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (200, 200), os.urandom(200 * 200 * 3)).save(buffer, 'PNG')
+        response = client.post('/api/houses/1/images', headers=admin_headers,
+                               files=[('images', ('photo.png', buffer.getvalue(), 'image/png'))])
+        assert response.status_code == 201, response.text
+    originals = {row.image for row in db.query(HouseImage).filter(HouseImage.image != 'placeholder.png')}
+
+    # The second replacement fails: the run stops with one image done
+    replace_references = compact_images.replace_references
+    calls = []
+    async def interrupted(session, entry):
+        calls.append(entry['image'])
+        if len(calls) == 2:
+            raise ConnectionError('server gone away')
+        await replace_references(session, entry)
+    monkeypatch.setattr(compact_images, 'replace_references', interrupted)
+    with pytest.raises(ConnectionError):
+        client.portal.call(compact_images.compact, args())
+    db.expire_all()
+    done = originals - {row.image for row in db.query(HouseImage)}
+    assert done == {calls[0]}
+
+    monkeypatch.setattr(compact_images, 'replace_references', replace_references)
+    report = client.portal.call(compact_images.compact, args())
+    # Only the image left over is encoded, neither the finished one nor its output
+    assert (report['replaced'], report['skipped'], report['failed']) == (1, 0, 0)
+    db.expire_all()
+    rows = db.query(HouseImage).filter(HouseImage.image != 'placeholder.png').all()
+    assert not {row.image for row in rows} & originals
+    assert all(row.image.endswith('.webp') and row.width <= 64 for row in rows)
+
+    assert client.portal.call(compact_images.compact, args())['replaced'] == 0
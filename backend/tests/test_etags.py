@@ -0,0 +1,24 @@
+"""Conditional GET: 304 while the tables behind a response are unchanged,
+a new ETag once one of them is written."""
+from conftest import seed_houses
+
+
+def test_etag_304_and_change_after_write(client, db):
+    seed_houses(db, 1)
+    first = client.get('/api/houses/1')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    not_modified = client.get('/api/houses/1', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == etag
+    assert client.get('/api/houses/1', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    # Another resource over the same tables has its own tag
+    assert client.get('/api/houses/').headers['ETag'] != etag
+
+    assert client.put('/api/houses/1', json={'name': 'Новый дом'}).status_code == 200
+    changed = client.get('/api/houses/1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.json()['name'] == 'Новый дом'
+    assert client.get('/api/houses/1', headers={'If-None-Match': changed.headers['ETag']}).status_code == 304
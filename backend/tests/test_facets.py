@@ -0,0 +1,39 @@
+"""Facet counts follow the filter, are cached, and the cache is dropped on writes."""
+from conftest import seed_houses
+from utils.response_cache import response_cache
+
+
+def facets(client, **params) -> dict:
+    # Skips the response cache, so the facet cache is what answers repeats
+    response_cache.clear()
+    response = client.get('/api/houses/facets', params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_facet_counts(client, db):
+    seed_houses(db, 3, apartments=0)
+    assert client.put('/api/houses/1', json={'status': 'BUILT', 'district': 'Север'}).status_code == 200
+
+    counts = facets(client)
+    assert counts['total'] == 3
+    assert sorted((row['value'], row['count']) for row in counts['status']) == [('BUILT', 1), ('FOR_SALE', 2)]
+    assert sorted((row['value'], row['count']) for row in counts['district']) == [('Север', 1), ('Центр', 2)]
+    assert counts['attributes'] == [{'id_attribute': 1, 'value': 'кирпич', 'count': 3}]
+
+    filtered = facets(client, district='Центр')
+    assert filtered['total'] == 2
+    assert filtered['status'] == [{'value': 'FOR_SALE', 'count': 2}]
+
+
+def test_facet_cache_invalidated_by_writes(client, db, statements):
+    seed_houses(db, 2, apartments=0)
+    before = facets(client)
+    statements.clear()
+    assert facets(client) == before
+    assert statements == []
+
+    assert client.put('/api/houses/2', json={'attributes': [{'id_attribute': 1, 'value': 'панель'}]}).status_code == 200
+    after = facets(client)
+    assert sorted((row['value'], row['count']) for row in after['attributes']) == [('кирпич', 1), ('панель', 1)]
+    assert after['total'] == before['total'] == 2
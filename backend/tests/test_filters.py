@@ -0,0 +1,45 @@
+"""House list filters: value ranges, and attribute pairs that must all match."""
+from conftest import seed_houses
+from models.houses import Attribute, HouseAttribute
+
+
+def ids(client, **params) -> list[int]:
+    response = client.get('/api/houses/', params=params)
+    if response.status_code == 404:
+        return []
+    assert response.status_code == 200, response.text
+    return [house['id'] for house in response.json()]
+
+
+def test_range_filters(client, db):
+    # start_price is 100 + n for house n + 1
+    seed_houses(db, 5, apartments=0)
+    assert client.put('/api/houses/5', json={'floors': 12, 'begin_date': '2023-06-01'}).status_code == 200
+
+    assert ids(client, min_price=101, max_price=103) == [2, 3, 4]
+    assert ids(client, min_price=103) == [4, 5]
+    assert ids(client, max_price=100) == [1]
+    assert ids(client, min_floors=10) == [5]
+    assert ids(client, max_begin_date='2023-12-31') == [5]
+    assert ids(client, min_price=101, max_floors=5) == [2, 3, 4]
+    assert ids(client, min_price=200) == []
+
+
+def test_attribute_filters_intersect(client, db):
+    # Every house has material (attribute 1) = кирпич
+    seed_houses(db, 4, apartments=0)
+    parking = Attribute(name='parking', description='Парковка')
+    db.add(parking)
+    db.flush()
+    db.add_all([HouseAttribute(id_house=id, id_attribute=parking.id, value=value)
+                for id, value in ((1, 'подземная'), (2, 'подземная'), (3, 'наземная'))])
+    db.query(HouseAttribute).filter_by(id_house=2, id_attribute=1).update({'value': 'панель'})
+    db.commit()
+
+    assert ids(client, attribute=f'{parking.id}:подземная') == [1, 2]
+    assert ids(client, attribute=['1:кирпич', f'{parking.id}:подземная']) == [1]
+    assert ids(client, attribute=['1:кирпич', f'{parking.id}:наземная']) == [3]
+    assert ids(client, attribute=['1:панель', f'{parking.id}:наземная']) == []
+    # The legacy single pair combines with the repeated ones
+    assert ids(client, id_attribute=1, attribute_value='кирпич', attribute=f'{parking.id}:подземная') == [1]
+    assert client.get('/api/houses/', params={'attribute': 'кирпич'}).status_code == 400
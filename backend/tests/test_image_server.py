@@ -0,0 +1,66 @@
+"""Image serving: validators and 304, single byte ranges, and derivatives
+picked by width and Accept."""
+import io
+import os
+import pytest
+from PIL import Image
+from conftest import seed_houses
+from utils.derivatives import derivative_path
+from utils.image_server import IMMUTABLE
+
+
+@pytest.fixture
+def stored_image(client, db, admin_headers) -> tuple[str, bytes]:
+    seed_houses(db, 1, apartments=0)
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (400, 300), os.urandom(400 * 300 * 3)).save(buffer, 'PNG')
+    data = buffer.getvalue()
+    response = client.post('/api/houses/1/images', headers=admin_headers,
+                           files=[('images', ('photo.png', data, 'image/png'))])
+    assert response.status_code == 201, response.text
+    return client.get('/api/houses/1').json()['images'][-1]['image'], data
+
+
+def test_original_validators_and_304(client, stored_image):
+    image, data = stored_image
+    response = client.get(f'/{image}')
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    # Content-addressed names carry their own ETag: the digest
+    assert response.headers['ETag'] == f'"{image.rsplit("/", 1)[1].split(".")[0]}"'
+
+    assert client.get(f'/{image}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(f'/{image}', headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+
+
+def test_range_requests(client, stored_image):
+    image, data = stored_image
+    response = client.get(f'/{image}', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(data)}'
+    assert response.content == data[10:20]
+
+    suffix = client.get(f'/{image}', headers={'Range': 'bytes=-5'})
+    assert (suffix.status_code, suffix.content) == (206, data[-5:])
+    assert client.get(f'/{image}', headers={'Range': f'bytes={len(data)}-'}).status_code == 416
+    # A stale If-Range gets the whole file
+    stale = client.get(f'/{image}', headers={'Range': 'bytes=10-19', 'If-Range': '"other"'})
+    assert (stale.status_code, stale.content) == (200, data)
+
+
+def test_derivative_selection(client, stored_image):
+    image, _ = stored_image
+    webp = client.get(f'/{image}', params={'w': 300}, headers={'Accept': 'image/webp,image/*'})
+    assert webp.status_code == 200
+    assert webp.headers['Content-Type'] == 'image/webp'
+    assert webp.headers['Vary'] == 'Accept'
+    # Widths are rounded up to a configured size
+    assert Image.open(io.BytesIO(webp.content)).width == 320
+    assert os.path.exists(derivative_path(image, 320, 'webp'))
+
+    jpeg = client.get(f'/{image}', params={'w': 330})
+    assert jpeg.headers['Content-Type'] == 'image/jpeg'
+    # 640 is wider than the original, which is not upscaled
+    assert Image.open(io.BytesIO(jpeg.content)).size == (400, 300)
+    assert os.path.exists(derivative_path(image, 640, 'jpeg'))
@@ -0,0 +1,64 @@
+"""Content-addressed image store: identical uploads share one file, which is
+deleted only once unreferenced and past its grace window."""
+import hashlib
+import io
+import os
+from PIL import Image
+from conftest import seed_houses
+from models.houses import HouseImage
+from utils.image import _pin_path, delete_image, image_path
+
+
+def noise_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (16, 16), os.urandom(16 * 16 * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def upload(client, headers, id_house: int, data: bytes) -> str:
+    response = client.post(f'/api/houses/{id_house}/images', headers=headers,
+                           files=[('images', ('photo.png', data, 'image/png'))])
+    assert response.status_code == 201, response.text
+    return max(client.get(f'/api/houses/{id_house}').json()['images'], key=lambda image: image['id'])
+
+
+def expire_grace(image: str):
+    os.utime(_pin_path(image), (0, 0))
+
+
+def test_identical_uploads_share_one_file(client, db, admin_headers):
+    seed_houses(db, 2, apartments=0)
+    data = noise_png()
+    first = upload(client, admin_headers, 1, data)
+    second = upload(client, admin_headers, 2, data)
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert first['image'] == second['image'] == f'{digest[:2]}/{digest[2:4]}/{digest}.png'
+    with open(image_path(first['image']), 'rb') as f:
+        assert f.read() == data
+    assert db.query(HouseImage).filter_by(image=first['image']).count() == 2
+
+
+def test_release_keeps_shared_and_pinned_files(client, db, admin_headers):
+    seed_houses(db, 2, apartments=0)
+    data = noise_png()
+    first = upload(client, admin_headers, 1, data)
+    second = upload(client, admin_headers, 2, data)
+    path = image_path(first['image'])
+
+    # Inside the grace window a file is kept, whatever the references say
+    assert delete_image(first['image']) is False
+    assert os.path.exists(path)
+
+    expire_grace(first['image'])
+    # Still referenced by the second house
+    response = client.request('DELETE', '/api/houses/1/images', headers=admin_headers,
+                              json={'ids_images': [first['id']]})
+    assert response.status_code == 200
+    assert os.path.exists(path)
+
+    response = client.request('DELETE', '/api/houses/2/images', headers=admin_headers,
+                              json={'ids_images': [second['id']]})
+    assert response.status_code == 200
+    assert not os.path.exists(path)
+    assert not os.path.exists(_pin_path(first['image']))
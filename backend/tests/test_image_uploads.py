@@ -0,0 +1,42 @@
+"""Multipart image uploads are streamed to disk and checked against the size
+and type limits; a rejected batch stores nothing."""
+import io
+import os
+from PIL import Image
+from conftest import seed_houses
+from models.houses import HouseImage
+import utils.image
+
+
+def png() -> bytes:
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (32, 32), os.urandom(32 * 32 * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def post_images(client, headers, *files: bytes):
+    return client.post('/api/houses/1/images', headers=headers,
+                       files=[('images', (f'photo-{n}.png', data, 'image/png')) for n, data in enumerate(files)])
+
+
+def stored_files() -> set[str]:
+    return {os.path.join(root, name) for root, _, names in os.walk(utils.image.IMAGE_DIR) for name in names}
+
+
+def test_upload_limits(client, db, admin_headers, monkeypatch):
+    seed_houses(db, 1, apartments=0)
+    monkeypatch.setattr(utils.image, 'IMAGE_MAX_BYTES', 20_000)
+    before = stored_files()
+
+    response = post_images(client, admin_headers, png(), b'GIF89a' + bytes(30_000))
+    assert response.status_code == 413
+    assert response.json()['detail']['filename'] == 'photo-1.png'
+    response = post_images(client, admin_headers, png(), b'%PDF-1.7 not an image')
+    assert response.status_code == 415
+    assert post_images(client, admin_headers, png(), b'').status_code == 400
+    # Neither the rejected files nor their valid neighbours were kept, not even as temp files
+    assert stored_files() == before
+    assert db.query(HouseImage).filter_by(id_house=1).count() == 1
+
+    assert post_images(client, admin_headers, png(), png()).status_code == 201
+    assert db.query(HouseImage).filter_by(id_house=1).count() == 3
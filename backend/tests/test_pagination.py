@@ -0,0 +1,44 @@
+"""Keyset pagination: following X-Next-Cursor visits every row once, in order."""
+import pytest
+from conftest import seed_houses
+
+
+def walk(client, limit: int, **params) -> list[int]:
+    ids, cursor = [], None
+    while True:
+        response = client.get('/api/houses/', params={**params, 'limit': limit, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= limit
+        ids += [house['id'] for house in page]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids
+
+
+@pytest.mark.parametrize('sort', ['start_price', 'begin_date'])
+@pytest.mark.parametrize('desc', [False, True])
+def test_cursor_round_trip(client, db, sort, desc):
+    seed_houses(db, 7, apartments=0)
+    everything = client.get('/api/houses/', params={'sort': sort, 'desc': desc}).json()
+    # begin_date is the same for every house: the id breaks the ties
+    expected = sorted(everything, key=lambda house: (house[sort], house['id']), reverse=desc)
+
+    assert walk(client, 3, sort=sort, desc=desc) == [house['id'] for house in expected]
+
+
+def test_total_count_header(client, db):
+    seed_houses(db, 4, apartments=0)
+    response = client.get('/api/houses/', params={'limit': 2, 'total': 'EXACT'})
+    assert response.headers['X-Total-Count'] == '4'
+
+
+def test_bad_cursor_is_rejected(client, db):
+    seed_houses(db, 3, apartments=0)
+    cursor = client.get('/api/houses/', params={'limit': 1, 'sort': 'start_price'}).headers['X-Next-Cursor']
+
+    assert client.get('/api/houses/', params={'limit': 1, 'cursor': 'not a cursor'}).status_code == 400
+    # A cursor only continues the sort order it was issued for
+    response = client.get('/api/houses/', params={'limit': 1, 'cursor': cursor, 'sort': 'start_price', 'desc': True})
+    assert response.status_code == 400
+    assert response.json()['detail']['message'] == 'Cursor does not match sort order'
@@ -0,0 +1,38 @@
+"""Pool metrics report the numbers each pool class has."""
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool, StaticPool
+from utils.pool_metrics import PoolMetrics, instrument_engine, pool_metrics, timed_pool_class
+
+
+def instrumented(name: str, pool_class, **options):
+    metrics = PoolMetrics(name)
+    engine = create_engine('sqlite://', poolclass=timed_pool_class(pool_class, metrics), **options)
+    instrument_engine(engine, metrics)
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    return metrics
+
+
+def test_static_pool_reports_counters_only(client, admin_headers):
+    metrics = instrumented('test-static', StaticPool)
+    try:
+        stats = metrics.snapshot()
+        assert stats['pool_class'] == 'TimedStaticPool'
+        assert (stats['checkouts'], stats['checkins']) == (1, 1)
+        assert not {'size', 'checkedout', 'overflow', 'overflow_checkouts'} & stats.keys()
+
+        response = client.get('/api/admin/pool', headers=admin_headers)
+        assert response.status_code == 200, response.text
+        assert next(row for row in response.json() if row['name'] == 'test-static') == stats
+    finally:
+        pool_metrics.pop('test-static')
+
+
+def test_queue_pool_reports_sizing():
+    metrics = instrumented('test-queue', QueuePool, pool_size=2, max_overflow=1)
+    try:
+        stats = metrics.snapshot()
+        assert (stats['size'], stats['checkedin'], stats['checkedout']) == (2, 1, 0)
+        assert stats['overflow_checkouts'] == 0
+    finally:
+        pool_metrics.pop('test-queue')
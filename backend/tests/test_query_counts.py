@@ -0,0 +1,42 @@
+"""Listing endpoints load related rows in batches: the number of statements
+does not grow with the number of rows returned."""
+from conftest import seed_houses
+from utils.response_cache import response_cache
+
+
+def count_statements(client, statements, url, **kwargs) -> int:
+    # Reference caches are warmed by the first request, the second one is counted
+    for _ in range(2):
+        response_cache.clear()
+        statements.clear()
+        response = client.get(url, **kwargs)
+        assert response.status_code == 200, response.text
+    return len(statements)
+
+
+def test_houses_statements_do_not_depend_on_row_count(client, db, statements):
+    seed_houses(db, 2)
+    few = count_statements(client, statements, '/api/houses/')
+    seed_houses(db, 18)
+    many = count_statements(client, statements, '/api/houses/')
+    assert len(client.get('/api/houses/').json()) == 20
+    assert many == few
+
+
+def test_orders_statements_do_not_depend_on_row_count(client, db, statements, admin_headers):
+    seed_houses(db, 2)
+    headers = admin_headers
+    few = count_statements(client, statements, '/api/orders/', headers=headers)
+    seed_houses(db, 18)
+    many = count_statements(client, statements, '/api/orders/', headers=headers)
+    assert len(client.get('/api/orders/', headers=headers).json()) == 20
+    assert many == few
+
+
+def test_house_tree_statements_do_not_depend_on_apartment_count(client, db, statements):
+    seed_houses(db, 1, apartments=1)
+    seed_houses(db, 1, apartments=12)
+    few = count_statements(client, statements, '/api/houses/1')
+    many = count_statements(client, statements, '/api/houses/2')
+    assert len(client.get('/api/houses/2').json()['apartments']) == 12
+    assert many == few
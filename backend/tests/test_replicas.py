@@ -0,0 +1,43 @@
+"""GET requests read from a replica unless a write, local or seen through the
+shared table versions, happened within REPLICA_LAG_SECONDS."""
+import shutil
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import config.database
+from config.database import AsyncSessionLocal, REPLICA_LAG_SECONDS
+from conftest import seed_houses, _workdir
+from utils.response_cache import response_cache
+from utils.version_sync import sync_table_versions
+from utils.versions import table_versions
+
+
+def test_write_on_another_worker_pins_reads_to_primary(client, db, monkeypatch):
+    seed_houses(db, 1)
+    id_house = db.execute(text('SELECT id FROM houses')).scalar()
+    # Replica: a copy of the primary that replays nothing afterwards
+    replica_path = f'{_workdir}/replica.db'
+    shutil.copy(f'{_workdir}/test.db', replica_path)
+    with create_engine(f'sqlite:///{replica_path}').begin() as connection:
+        connection.execute(text("UPDATE houses SET name = 'Реплика'"))
+    replica = create_async_engine(f'sqlite+aiosqlite:///{replica_path}')
+    replica_session = async_sessionmaker(bind=replica, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr(config.database, 'ReplicaSessionLocals', [replica_session])
+    monkeypatch.setattr(config.database, '_replicas', iter(lambda: replica_session, None))
+    monkeypatch.setattr(table_versions, 'last_write', time.time() - REPLICA_LAG_SECONDS - 1)
+    monkeypatch.setattr(table_versions, 'last_remote_write', time.time() - REPLICA_LAG_SECONDS - 1)
+    try:
+        response_cache.clear()
+        assert client.get(f'/api/houses/{id_house}').json()['name'] == 'Реплика'
+
+        # Another worker commits: the row and its table version change together on the primary
+        db.execute(text("UPDATE houses SET name = 'Новое' WHERE id = :id"), {'id': id_house})
+        db.execute(text("UPDATE table_versions SET version = version + 1 WHERE name = 'houses'"))
+        db.commit()
+        client.portal.call(sync_table_versions, AsyncSessionLocal)
+
+        response_cache.clear()
+        response = client.get(f'/api/houses/{id_house}')
+        assert response.json()['name'] == 'Новое'
+    finally:
+        client.portal.call(replica.dispose)
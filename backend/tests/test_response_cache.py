@@ -0,0 +1,61 @@
+"""Catalog GETs are served from the response cache: HIT while fresh, STALE
+with a background refresh afterwards, MISS after a write to their tables."""
+import time
+from sqlalchemy import text
+from conftest import seed_houses
+from utils.response_cache import response_cache
+
+
+def get_house(client, id_house: int, **kwargs):
+    return client.get(f'/api/houses/{id_house}', **kwargs)
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def test_fresh_entry_is_a_hit(client, db):
+    seed_houses(db, 1)
+    id_house = db.execute(text('SELECT id FROM houses')).scalar()
+    first = get_house(client, id_house)
+    second = get_house(client, id_house)
+    assert first.headers['x-cache'] == 'MISS'
+    assert second.headers['x-cache'] == 'HIT'
+    assert second.json() == first.json()
+
+
+def test_stale_entry_is_served_and_refreshed_despite_conditional_headers(client, db):
+    seed_houses(db, 1)
+    id_house = db.execute(text('SELECT id FROM houses')).scalar()
+    etag = get_house(client, id_house).headers['etag']
+    # Changed behind the versions' back: only the refresh can pick it up
+    db.execute(text("UPDATE houses SET name = 'Обновлён' WHERE id = :id"), {'id': id_house})
+    db.commit()
+    for entry in response_cache._entries.values():
+        entry.fresh_until = 0
+
+    stale = get_house(client, id_house, headers={'If-None-Match': etag})
+    assert stale.status_code == 304
+    assert stale.headers['x-cache'] == 'STALE'
+    # Polled on the cache itself: another request would trigger a refresh of its own
+    key = f'/api/houses/{id_house}?'
+    wait_for(lambda: response_cache.lookup(key)[1])
+    refreshed = get_house(client, id_house)
+    assert refreshed.headers['x-cache'] == 'HIT'
+    assert refreshed.json()['name'] == 'Обновлён'
+
+
+def test_write_invalidates_cached_responses(client, db, admin_headers):
+    seed_houses(db, 1)
+    id_house = db.execute(text('SELECT id FROM houses')).scalar()
+    get_house(client, id_house)
+    assert get_house(client, id_house).headers['x-cache'] == 'HIT'
+
+    response = client.put(f'/api/houses/{id_house}', json={'name': 'Переименован'}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    after = get_house(client, id_house)
+    assert after.headers['x-cache'] == 'MISS'
+    assert after.json()['name'] == 'Переименован'
@@ -0,0 +1,72 @@
+"""Full-text search: tokenizer, BM25 ranking, prefix matching, incremental
+updates and writes made by other workers."""
+import time
+from sqlalchemy import text
+from config.database import AsyncSessionLocal
+from conftest import seed_houses
+from utils.search import SearchIndex, tokenize, search_index
+from utils.version_sync import poll_once, refresh_search_index
+
+
+def test_tokenize_lowercases_and_stems():
+    assert tokenize('Кирпичный ДОМ, ёлки') == ['кирпичн', 'дом', 'елк']
+    assert tokenize('Parking spaces') == ['park', 'spac']
+    assert tokenize(None) == []
+
+
+def test_ranking_prefers_names_and_rare_terms():
+    index = SearchIndex()
+    index.add('house', 1, 'Дом у реки', ['Кирпичный дом'])
+    index.add('house', 2, 'Дом в центре', ['Рядом река'])
+    index.add('house', 3, 'Дом в лесу', ['Деревянный дом'])
+    ids = [id for _, id, _, _ in index.search('река')]
+    assert ids == [1, 2]
+    assert [id for _, id, _, _ in index.search('кирпичный дом')][0] == 1
+
+
+def test_prefix_matches_rank_below_exact_ones():
+    index = SearchIndex()
+    index.add('apartment', 1, 'Студия', [])
+    index.add('apartment', 2, 'Студийная квартира', [])
+    hits = index.search('студ')
+    assert {id for _, id, _, _ in hits} == {1, 2}
+    assert index.search('студия')[0][1] == 1
+
+
+def test_incremental_update_and_remove():
+    index = SearchIndex()
+    index.add('house', 1, 'Старое название', [])
+    index.add('house', 1, 'Новое название', [])
+    assert index.search('старое') == []
+    assert [id for _, id, _, _ in index.search('новое')] == [1]
+    index.remove('house', 1)
+    assert index.search('новое') == [] and len(index) == 0
+
+
+def test_rebuild_replays_changes_made_meanwhile():
+    index, fresh = SearchIndex(), SearchIndex()
+    index.begin_rebuild()
+    index.add('house', 7, 'Добавлен во время перестройки', [])
+    index.finish_rebuild(fresh)
+    assert [id for _, id, _, _ in index.search('перестройки')] == [7]
+
+
+def test_write_by_another_worker_reaches_the_index(client, db):
+    seed_houses(db, 1)
+    db.execute(text("UPDATE houses SET name = 'Маяк' WHERE id = (SELECT MIN(id) FROM houses)"))
+    db.execute(text("UPDATE table_versions SET version = version + 1, modified = :now WHERE name = 'houses'"),
+               {'now': int(time.time())})
+    db.commit()
+    client.portal.call(poll_once, AsyncSessionLocal)
+    assert [hit['name'] for hit in client.get('/api/search/', params={'q': 'маяк'}).json()] == ['Маяк']
+
+
+def test_deleted_house_leaves_the_index_with_its_apartments(client, db):
+    seed_houses(db, 1, apartments=1)
+    id_house = db.execute(text('SELECT id FROM houses')).scalar()
+    client.portal.call(refresh_search_index, AsyncSessionLocal)
+    assert client.get('/api/search/', params={'q': 'квартира', 'type': 'apartment'}).json()
+
+    assert client.delete(f'/api/houses/{id_house}').status_code == 200
+    assert client.get('/api/search/', params={'q': 'квартира'}).json() == []
+    assert ('house', id_house) not in search_index._documents
@@ -0,0 +1,29 @@
+"""A request commits once at the end: a handler failing midway leaves no trace."""
+import pytest
+from conftest import seed_houses
+from models.apartments import Apartment
+from models.houses import House
+from models.versions import TableVersion
+from service.houses import HouseService
+import routers.houses
+
+
+def test_failed_handler_rolls_back_the_whole_request(client, db, monkeypatch):
+    seed_houses(db, 1, apartments=2)
+    versions = {row.name: row.version for row in db.query(TableVersion)}
+    released = []
+    monkeypatch.setattr(routers.houses, 'release_images', released.append)
+
+    async def fail(self, id):
+        raise RuntimeError('disk full')
+    # The apartments are already deleted when the house delete fails
+    monkeypatch.setattr(HouseService, 'delete_house', fail)
+    with pytest.raises(RuntimeError):
+        client.delete('/api/houses/1')
+
+    db.expire_all()
+    assert db.query(House).count() == 1
+    assert db.query(Apartment).filter_by(id_house=1).count() == 2
+    assert {row.name: row.version for row in db.query(TableVersion)} == versions
+    assert released == []
+    assert client.get('/api/houses/1').status_code == 200
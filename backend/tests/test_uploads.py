@@ -0,0 +1,101 @@
+"""Resumable uploads: chunks in any order, size limits, and a finalize that
+runs once however often it is called."""
+import hashlib
+import io
+import os
+import pytest
+from PIL import Image
+from conftest import seed_houses
+from models.houses import HouseImage
+import utils.image
+import utils.uploads
+
+CHUNK_SIZE = 4096
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(utils.uploads, 'IMAGE_UPLOAD_MIN_CHUNK_SIZE', 1024)
+
+
+def noise_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (64, 64), os.urandom(64 * 64 * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def create_upload(client, headers, size: int, chunk_size: int = CHUNK_SIZE):
+    return client.post('/api/uploads/', headers=headers,
+                       json={'target': 'HOUSE', 'id_target': 1, 'size': size, 'chunk_size': chunk_size})
+
+
+def put_chunk(client, headers, upload: dict, data: bytes, index: int) -> dict:
+    chunk = data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+    response = client.put(f"/api/uploads/{upload['id']}/chunks/{index}", headers=headers, content=chunk)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_upload_resumes_after_partial_upload(client, db, admin_headers, small_chunks, monkeypatch):
+    seed_houses(db, 1)
+    data = noise_png()
+    upload = create_upload(client, admin_headers, len(data)).json()
+    assert upload['chunks'] >= 3
+
+    put_chunk(client, admin_headers, upload, data, 2)
+    state = put_chunk(client, admin_headers, upload, data, 0)
+    assert state['received'][0] == [0, CHUNK_SIZE]
+    response = client.post(f"/api/uploads/{upload['id']}/finalize", headers=admin_headers)
+    assert response.status_code == 409
+    assert response.json()['detail']['received'] == state['received']
+
+    # The client resumes from the state the server reports
+    state = client.get(f"/api/uploads/{upload['id']}", headers=admin_headers).json()
+    done = {start // CHUNK_SIZE for start, end in state['received'] for start in range(start, end, CHUNK_SIZE)}
+    for index in sorted(set(range(upload['chunks'])) - done):
+        state = put_chunk(client, admin_headers, upload, data, index)
+    assert state['complete']
+
+    # The digest was computed while the chunks arrived, finalize does not read the file
+    monkeypatch.setattr(utils.image.hashlib, 'file_digest', None)
+    response = client.post(f"/api/uploads/{upload['id']}/finalize", headers=admin_headers)
+    assert response.status_code == 201, response.text
+    image = response.json()['image']
+    assert hashlib.sha256(data).hexdigest() in image
+    assert db.query(HouseImage).filter_by(id_house=1, image=image).count() == 1
+
+
+def test_upload_limits(client, db, admin_headers, small_chunks, monkeypatch):
+    seed_houses(db, 1)
+    response = create_upload(client, admin_headers, 10_000, chunk_size=512)
+    assert response.status_code == 413
+    monkeypatch.setattr(utils.uploads, 'IMAGE_UPLOAD_MAX_CHUNKS', 4)
+    assert create_upload(client, admin_headers, 4 * 1024, chunk_size=1024).status_code == 201
+    assert create_upload(client, admin_headers, 4 * 1024 + 1, chunk_size=1024).status_code == 413
+
+
+def test_double_finalize_returns_the_first_result(client, db, admin_headers, small_chunks):
+    seed_houses(db, 1)
+    data = noise_png()
+    upload = create_upload(client, admin_headers, len(data)).json()
+    for index in range(upload['chunks']):
+        put_chunk(client, admin_headers, upload, data, index)
+    url = f"/api/uploads/{upload['id']}/finalize"
+
+    # While another call holds the session, finalize does not run a second time
+    assert utils.uploads.claim_finalize(upload['id']) is None
+    assert client.post(url, headers=admin_headers).status_code == 409
+    utils.uploads.release_finalize(upload['id'])
+
+    first = client.post(url, headers=admin_headers)
+    second = client.post(url, headers=admin_headers)
+    assert first.status_code == 201, first.text
+    assert second.json() == first.json()
+    assert db.query(HouseImage).filter_by(id_house=1, image=first.json()['image']).count() == 1
+
+
+def test_image_routes_require_admin(client, db):
+    seed_houses(db, 1)
+    response = client.request('DELETE', '/api/houses/1/images', json={'ids_images': [1]})
+    assert response.status_code == 401
+    assert db.query(HouseImage).filter_by(id_house=1).count() == 1
@@ -0,0 +1,35 @@
+"""PUT /api/houses/{id} upserts attributes in one statement; replace_attributes
+deletes the ones left out of the payload."""
+from conftest import seed_houses
+from models.houses import Attribute, HouseAttribute
+
+
+def house_attributes(db, id_house: int) -> dict:
+    db.expire_all()
+    return {row.id_attribute: row.value for row in db.query(HouseAttribute).filter_by(id_house=id_house)}
+
+
+def put_attributes(client, id_house: int, attributes: dict, **params):
+    response = client.put(f'/api/houses/{id_house}', params=params,
+                          json={'attributes': [{'id_attribute': id, 'value': value} for id, value in attributes.items()]})
+    assert response.status_code == 200, response.text
+
+
+def test_upsert_inserts_updates_and_replaces(client, db, statements):
+    seed_houses(db, 1)
+    floors = Attribute(name='floors', description='Этажность')
+    db.add(floors)
+    db.commit()
+    assert house_attributes(db, 1) == {1: 'кирпич'}
+
+    statements.clear()
+    put_attributes(client, 1, {1: 'панель', floors.id: '9'})
+    assert house_attributes(db, 1) == {1: 'панель', floors.id: '9'}
+    assert sum(statement.startswith('INSERT INTO house_attributes') for statement in statements) == 1
+
+    # Without replace_attributes the missing attribute is kept
+    put_attributes(client, 1, {floors.id: '12'})
+    assert house_attributes(db, 1) == {1: 'панель', floors.id: '12'}
+
+    put_attributes(client, 1, {floors.id: '16'}, replace_attributes=True)
+    assert house_attributes(db, 1) == {floors.id: '16'}
@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.unit_of_work import savepoint
+from utils.version_sync import touch
 
 class AbstractRepository(ABC):
     @abstractmethod
@@ -9,6 +13,10 @@ class AbstractRepository(ABC):
     @abstractmethod
     def get_one_filter_by(self, id):
         pass
+
+    @abstractmethod
+    def get_many_by_ids(self, ids, key='id'):
+        pass
     
     @abstractmethod
     def add(self, entity):
@@ -26,41 +34,157 @@ class AbstractRepository(ABC):
     def delete_by_filter(self, **filter):
         pass
 
-class IREpository(AbstractRepository):
-    def __init__(self, model, session: Session):
+class AsyncIREpository(AbstractRepository):
+    """Repository over an AsyncSession.
+
+    `select_*` methods only build statements, so services can add options,
+    joins and grouping before running them with `all`/`scalar`/`execute`.
+    Writes only flush: the request's unit of work (utils/unit_of_work.py)
+    commits them together.
+    """
+    def __init__(self, model, session: AsyncSession):
         self.model = model
         self.session = session
 
-    def get_all_filter_by(self, **filters):
-        query = self.session.query(self.model)
+    def _touch(self):
+        # Shared version behind the ETag/Last-Modified headers and the caches
+        touch(self.session, self.model.__tablename__)
+
+    def select_filter_by(self, **filters):
+        statement = select(self.model)
         for key, value in filters.items():
-            query = query.filter(getattr(self.model, key) == value)
-        return query
+            statement = statement.where(getattr(self.model, key) == value)
+        return statement
+
+    def select_in_range(self, ranges: dict, **filters):
+        # ranges: {column: (min, max)}, either bound may be None
+        statement = self.select_filter_by(**filters)
+        for key, (low, high) in ranges.items():
+            column = getattr(self.model, key)
+            if low is not None:
+                statement = statement.where(column >= low)
+            if high is not None:
+                statement = statement.where(column <= high)
+        return statement
+
+    async def all(self, statement) -> list:
+        return list((await self.session.scalars(statement)).all())
+
+    async def first(self, statement):
+        return (await self.session.scalars(statement.limit(1))).first()
+
+    async def execute(self, statement):
+        return await self.session.execute(statement)
+
+    async def get_all_filter_by(self, **filters):
+        return await self.all(self.select_filter_by(**filters))
 
-    def get_one_filter_by(self, **filter):
-        return self.session.query(self.model).filter_by(**filter).first()
+    async def get_one_filter_by(self, **filter):
+        return await self.first(select(self.model).filter_by(**filter))
 
-    def add(self, entity: dict):
+    async def get_many_by_ids(self, ids, key: str = 'id'):
+        ids = set(ids)
+        if not ids:
+            return []
+        return await self.all(select(self.model).where(getattr(self.model, key).in_(ids)))
+
+    async def add(self, entity: dict):
         entity = self.model(**entity)
         self.session.add(entity)
-        self.session.commit()
+        await self.session.flush()
+        self._touch()
         return entity
 
-    def update(self, entity: dict):
-        self.session.query(self.model).filter_by(id=entity['id']).update(entity)
-        self.session.commit()
+    def savepoint(self):
+        return savepoint(self.session)
+
+    async def add_all(self, entities: list[dict]) -> list:
+        """One multi-row INSERT for all `entities`; returns transient model
+        instances carrying the generated ids, in the order given.
+
+        Auto-increment ids of a single multi-row INSERT are handed out in row
+        order (InnoDB's consecutive allocation, SQLite rowids, PostgreSQL
+        sequences), so the rows' ids are the statement's ids in ascending order:
+        read back with RETURNING where the backend has it, or counted from
+        LAST_INSERT_ID() (the first row's id) on MySQL, assuming
+        auto_increment_increment = 1.
+        """
+        if not entities:
+            return []
+        statement = insert(self.model).values(entities)
+        if self.session.bind.dialect.insert_returning:
+            ids = sorted((await self.session.execute(statement.returning(self.model.id))).scalars())
+        else:
+            result = await self.session.execute(statement)
+            ids = range(result.lastrowid, result.lastrowid + len(entities))
+        self._touch()
+        return [self.model(**entity, id=id) for entity, id in zip(entities, ids)]
+
+    async def add_many(self, entities: list[dict]):
+        # One executemany INSERT, the driver sends it as a multi-row VALUES list
+        if not entities:
+            return
+        await self.session.execute(insert(self.model), entities)
+        self._touch()
+
+    async def upsert(self, entities: list[dict], update_columns: tuple[str, ...]):
+        """Single multi-row INSERT that updates `update_columns` of rows whose
+        primary key already exists (ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE).
+        Raises NotImplementedError on other dialects."""
+        if not entities:
+            return 0
+        dialect = self.session.bind.dialect.name
+        if dialect == 'mysql':
+            statement = mysql.insert(self.model).values(entities)
+            statement = statement.on_duplicate_key_update({column: statement.inserted[column] for column in update_columns})
+        elif dialect in ('sqlite', 'postgresql'):
+            statement = (sqlite if dialect == 'sqlite' else postgresql).insert(self.model).values(entities)
+            statement = statement.on_conflict_do_update(
+                index_elements=[column.name for column in self.model.__table__.primary_key],
+                set_={column: statement.excluded[column] for column in update_columns})
+        else:
+            raise NotImplementedError(f'upsert is not supported for the {dialect} dialect')
+        result = await self.session.execute(statement)
+        self._touch()
+        return result.rowcount
+
+    async def delete_except(self, key: str, keep, **filter):
+        # Deletes rows matching `filter` whose `key` is not in `keep`
+        statement = delete(self.model).filter_by(**filter)
+        if keep:
+            statement = statement.where(getattr(self.model, key).not_in(set(keep)))
+        result = await self.session.execute(statement)
+        self._touch()
+        return result.rowcount
+
+    async def update(self, entity: dict):
+        await self.session.execute(update(self.model).filter_by(id=entity['id']).values(entity))
+        self._touch()
         return entity
 
-    def delete(self, id: int):
-        self.session.query(self.model).filter_by(id=id).delete()
-        self.session.commit()
+    async def delete(self, id: int):
+        await self.session.execute(delete(self.model).filter_by(id=id))
+        self._touch()
 
-    def update_by_filter(self, filters: dict, updates: dict):
-        result = self.session.query(self.model).filter_by(**filters).update(updates)
-        self.session.commit()
-        return result
+    async def update_many_by_ids(self, ids, updates: dict):
+        statement = update(self.model).where(self.model.id.in_(set(ids))).values(updates)
+        result = await self.session.execute(statement.execution_options(synchronize_session=False))
+        self._touch()
+        return result.rowcount
 
-    def delete_by_filter(self, **filter):
-        result = self.session.query(self.model).filter_by(**filter).delete()
-        self.session.commit()
-        return result > 0
+    async def update_by_filter(self, filters: dict, updates: dict):
+        result = await self.session.execute(update(self.model).filter_by(**filters).values(updates))
+        self._touch()
+        return result.rowcount
+
+    async def delete_by_filter(self, **filter):
+        result = await self.session.execute(delete(self.model).filter_by(**filter))
+        self._touch()
+        return result.rowcount > 0
+
+    async def delete_where(self, *criteria):
+        # Set-based delete for conditions filter_by cannot express (IN, subqueries)
+        result = await self.session.execute(delete(self.model).where(*criteria)
+                                            .execution_options(synchronize_session=False))
+        self._touch()
+        return result.rowcount
@@ -0,0 +1,49 @@
+from sqlalchemy.exc import DBAPIError
+from utils.enums import Status
+
+
+async def insert_with_children(parent_repository, child_repository, items: list, foreign_key: str) -> dict:
+    """Inserts parent rows and their child rows in batches.
+
+    items: [(index, parent_row, child_rows)]. Returns {index: created entity}
+    or {index: error message} for rows the database rejected. Parents go in
+    one multi-row INSERT, children in another, the whole batch in one
+    savepoint; if the database rejects it, the rows are retried one savepoint
+    each, so one bad row does not fail its neighbours.
+    """
+    if not items:
+        return {}
+    try:
+        async with parent_repository.savepoint():
+            return await _insert(parent_repository, child_repository, items, foreign_key)
+    except DBAPIError:
+        pass
+
+    results = {}
+    for item in items:
+        try:
+            async with parent_repository.savepoint():
+                results.update(await _insert(parent_repository, child_repository, [item], foreign_key))
+        except DBAPIError as error:
+            results[item[0]] = str(error.orig)
+    return results
+
+
+async def _insert(parent_repository, child_repository, items: list, foreign_key: str) -> dict:
+    created = await parent_repository.add_all([row for _, row, _ in items])
+    await child_repository.add_many([{**child, foreign_key: entity.id}
+                                     for (_, _, children), entity in zip(items, created)
+                                     for child in children])
+    return {index: entity for (index, _, _), entity in zip(items, created)}
+
+
+def bulk_results(results: dict, count: int) -> list[dict]:
+    # results: {index: entity | error message}, see insert_with_children
+    response = []
+    for index in range(count):
+        result = results[index]
+        if isinstance(result, str):
+            response.append({'index': index, 'status': Status.FAILED.value, 'message': result})
+        else:
+            response.append({'index': index, 'status': Status.SUCCESS.value, 'id': result.id})
+    return response
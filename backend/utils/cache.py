@@ -0,0 +1,157 @@
+import inspect
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import wraps
+from utils.unit_of_work import on_commit
+
+_caches = []
+
+
+class CacheBackend(ABC):
+    """Tag-invalidated key/value cache with TTL and stale-while-revalidate windows.
+
+    `version` changes on every invalidation; passing the version read before
+    computing a value to `set` drops the write if an invalidation happened in
+    between, so a slow reader cannot put pre-write data back into the cache.
+    An external store (e.g. Redis) can implement the same interface.
+    """
+    version: int = 0
+
+    @abstractmethod
+    def lookup(self, key):
+        """Returns (value, is_fresh) or None when missing or past its stale window."""
+
+    @abstractmethod
+    def set(self, key, value, tags=(), ttl=None, stale_ttl=0, size=0, version=None) -> bool:
+        pass
+
+    @abstractmethod
+    def invalidate(self, *tags):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def get(self, key, default=None):
+        entry = self.lookup(key)
+        if entry is None or not entry[1]:
+            return default
+        return entry[0]
+
+
+class _Entry:
+    __slots__ = ('value', 'tags', 'fresh_until', 'stale_until', 'size')
+
+    def __init__(self, value, tags, fresh_until, stale_until, size):
+        self.value = value
+        self.tags = tags
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.size = size
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU bounded by entry count and total size.
+
+    Every instance is registered so that `invalidate_tags` (and the
+    `invalidates` decorator used by the services) reaches all of them.
+    """
+    def __init__(self, maxsize: int = 1024, max_bytes: int | None = None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.version = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def lookup(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.stale_until is not None and now > entry.stale_until:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value, entry.fresh_until is None or now <= entry.fresh_until
+
+    def set(self, key, value, tags=(), ttl=None, stale_ttl=0, size=0, version=None) -> bool:
+        now = time.monotonic()
+        fresh_until = None if ttl is None else now + ttl
+        stale_until = None if ttl is None else fresh_until + stale_ttl
+        with self._lock:
+            if version is not None and version != self.version:
+                return False
+            self._remove(key)
+            self._entries[key] = _Entry(value, tuple(tags), fresh_until, stale_until, size)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.maxsize
+                                     or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+            return key in self._entries
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self.version += 1
+            for tag in tags:
+                for key in self._tags.pop(tag, set()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+
+def make_key(*parts) -> str:
+    return json.dumps(parts, default=str, sort_keys=True, separators=(',', ':'))
+
+
+def invalidate_tags(*tags):
+    for cache in _caches:
+        cache.invalidate(*tags)
+
+
+def invalidates(*tags):
+    """Drops cached entries tagged with any of `tags` once the wrapped write
+    is committed (right away outside of a unit of work)."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                result = await func(*args, **kwargs)
+                on_commit(lambda: invalidate_tags(*tags), key=('invalidate', tags))
+                return result
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            on_commit(lambda: invalidate_tags(*tags), key=('invalidate', tags))
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+from config.images import (IMAGE_DIR, IMAGE_WIDTHS, IMAGE_FORMATS, IMAGE_QUALITY,
+                           IMAGE_DERIVATIVE_DIR, IMAGE_WORKERS, IMAGE_LQIP_WIDTH)
+from utils.image_server import HASHED_NAME_RE
+
+CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+_executor: ProcessPoolExecutor | None = None
+# Derivative path -> future of the encode in progress, so concurrent requests share one
+_pending: dict[str, asyncio.Future] = {}
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def snap_width(width: int) -> int:
+    # Rounds up to a configured width so clients cannot fill the disk with arbitrary sizes
+    for size in IMAGE_WIDTHS:
+        if width <= size:
+            return size
+    return IMAGE_WIDTHS[-1]
+
+
+def negotiate_format(accept: str | None) -> str:
+    accept = accept or ''
+    for format in IMAGE_FORMATS:
+        if format == 'jpeg' or CONTENT_TYPES[format] in accept:
+            return format
+    return 'jpeg'
+
+
+def derivative_path(image: str, width: int, format: str) -> str:
+    return os.path.join(IMAGE_DERIVATIVE_DIR, str(width), f'{image}.{format}')
+
+
+def is_fresh(image: str, source: str, target: str) -> bool:
+    # Content-hashed originals never change, any derivative of them is current.
+    # Legacy names can be replaced: derivatives older than the original are stale.
+    if HASHED_NAME_RE.match(image):
+        return os.path.exists(target)
+    try:
+        return os.stat(target).st_mtime_ns >= os.stat(source).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def render(source: str, target: str, width: int, format: str) -> str:
+    # Runs in a worker process
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image.thumbnail((width, image.height * width // image.width + 1), Image.Resampling.LANCZOS)
+        if format == 'jpeg' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp = f'{target}.{os.getpid()}.part'
+        image.save(temp, format=format.upper(), quality=IMAGE_QUALITY)
+    os.replace(temp, target)
+    return target
+
+
+def describe(source: str) -> dict:
+    # Runs in a worker process: metadata stored with HouseImage/ApartmentImage rows
+    with Image.open(source) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in (5, 6, 7, 8):
+            # Rotated by the EXIF orientation, as browsers display it
+            width, height = height, width
+        # JPEG decodes straight to a reduced scale, the rest is downscaled once
+        image.draft('RGB', (IMAGE_LQIP_WIDTH * 8, IMAGE_LQIP_WIDTH * 8))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((64, 64))
+        # Most frequent of 8 palette colors, closer to what the eye sees than the mean
+        palette = image.quantize(8)
+        _, index = max(palette.getcolors())
+        dominant = palette.getpalette()[index * 3:index * 3 + 3]
+        image.thumbnail((IMAGE_LQIP_WIDTH, IMAGE_LQIP_WIDTH))
+        buffer = io.BytesIO()
+        image.save(buffer, format='WEBP', quality=30)
+    return {
+        'width': width,
+        'height': height,
+        'size': os.path.getsize(source),
+        'dominant_color': '#{:02x}{:02x}{:02x}'.format(*dominant),
+        'lqip': 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'),
+    }
+
+
+async def describe_images(images: list[str]) -> list[dict]:
+    # Metadata of stored images, computed in the worker pool; {} for files Pillow cannot read
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(loop.run_in_executor(get_executor(), describe,
+                                                          os.path.join(IMAGE_DIR, *image.split('/')))
+                                     for image in images),
+                                   return_exceptions=True)
+    return [result if isinstance(result, dict) else {} for result in results]
+
+
+async def get_derivative(image: str, width: int, format: str) -> str:
+    """Path of `image` resized to `width` in `format`, encoded on first use."""
+    source = os.path.join(IMAGE_DIR, *image.split('/'))
+    target = derivative_path(image, width, format)
+    if is_fresh(image, source, target):
+        return target
+    future = _pending.get(target)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(get_executor(), render, source, target, width, format)
+        _pending[target] = future
+        future.add_done_callback(lambda _: _pending.pop(target, None))
+    return await asyncio.shield(future)
+
+
+async def generate_derivatives(images: list[str]) -> None:
+    # Pre-renders every width and format of freshly uploaded images; runs as a background task
+    await asyncio.gather(*(get_derivative(image, width, format)
+                           for image in images
+                           for width in IMAGE_WIDTHS
+                           for format in IMAGE_FORMATS),
+                         return_exceptions=True)
+
+
+def delete_derivatives(image: str) -> None:
+    for width in IMAGE_WIDTHS:
+        for format in IMAGE_FORMATS:
+            path = derivative_path(image, width, format)
+            if os.path.exists(path):
+                os.remove(path)
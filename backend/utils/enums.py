@@ -48,3 +48,13 @@ class HouseStatus(str, Enum):
     FOR_SALE = "FOR_SALE"  # Выставлен на продажу
     SOLD = "SOLD"  # Продан
     ARCHIVED = "ARCHIVED"  # Переведен в архив, неактивен
+
+
+class TotalCount(str, Enum):
+    EXACT = 'EXACT'  # SELECT COUNT(*) по текущему фильтру
+    ESTIMATE = 'ESTIMATE'  # Оценка из статистики таблицы, без фильтра
+
+
+class ExportFormat(str, Enum):
+    NDJSON = 'NDJSON'
+    CSV = 'CSV'
@@ -0,0 +1,19 @@
+from fastapi import HTTPException
+from utils.enums import Status
+
+
+def parse_value_filters(raw: list[str] | None, id: int | None = None, value: str | None = None) -> list[tuple[int, str]]:
+    """Parses repeated `<id>:<value>` query parameters into (id, value) pairs.
+
+    The legacy single `id`/`value` pair, when given, is added to the result.
+    """
+    pairs = set()
+    for item in raw or []:
+        key, sep, item_value = item.partition(':')
+        if not sep or not key.strip().isdigit() or not item_value:
+            raise HTTPException(status_code=400, detail={'status': Status.FAILED.value,
+                                                         'message': f'Invalid filter "{item}", expected <id>:<value>'})
+        pairs.add((int(key), item_value))
+    if id and value:
+        pairs.add((id, value))
+    return sorted(pairs)
@@ -0,0 +1,19 @@
+class IdentityMap:
+    """Request-scoped cache of loaded rows, keyed by model and primary key.
+
+    Services live for a single request (see dependencies.py), so an instance
+    attribute holding an IdentityMap never outlives the request's session.
+    """
+    def __init__(self):
+        self._entities = {}
+
+    async def get_many(self, repository, ids) -> dict:
+        entities = self._entities.setdefault(repository.model, {})
+        missing = {id for id in ids if id is not None and id not in entities}
+        if missing:
+            for entity in await repository.get_many_by_ids(missing):
+                entities[entity.id] = entity
+        return {id: entities[id] for id in ids if id in entities}
+
+    async def get_one(self, repository, id):
+        return (await self.get_many(repository, [id])).get(id)
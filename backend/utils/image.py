@@ -1,20 +1,223 @@
+import asyncio
+import hashlib
 import os
-from fastapi import UploadFile
+import time
+import anyio
+from contextlib import suppress
+from fastapi import UploadFile, HTTPException
+from sqlalchemy import select, union
+from config.images import (IMAGE_DIR, IMAGE_MAX_BYTES, IMAGE_CHUNK_SIZE, IMAGE_UPLOAD_CONCURRENCY,
+                           IMAGE_DELETE_GRACE, IMAGE_PIN_DIR)
+from config.database import AsyncSessionLocal
+from models import House, HouseImage, Apartment, ApartmentImage
+from utils.enums import Status
+from utils.derivatives import delete_derivatives
 
-def save_image(image: UploadFile) -> str:
-    save_path = f'images'
-    os.makedirs(save_path, exist_ok=True)
-    image_path = os.path.join(save_path, image.filename)
+# File signatures of the accepted formats, checked on the first chunk
+IMAGE_SIGNATURES = {
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/gif': (b'GIF87a', b'GIF89a'),
+    'image/webp': (b'RIFF',),
+}
+IMAGE_EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif',
+                    'image/webp': '.webp', 'image/avif': '.avif'}
 
-    with open(image_path, "wb") as f:
-        f.write(image.file.read())
-        
-    return image_path
+upload_limiter = anyio.CapacityLimiter(IMAGE_UPLOAD_CONCURRENCY)
 
-def delete_image(image: str) -> None:
-    if image == "placeholder.png":
+def image_type(head: bytes) -> str | None:
+    for content_type, signatures in IMAGE_SIGNATURES.items():
+        if head.startswith(signatures):
+            if content_type == 'image/webp' and head[8:12] != b'WEBP':
+                continue
+            return content_type
+    # AVIF/HEIF: ISO BMFF 'ftyp' box
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis', b'heic', b'mif1'):
+        return 'image/avif'
+    return None
+
+def image_name(digest: str, content_type: str) -> str:
+    # Content-addressed: ab/cd/abcd...<sha256>.jpg, two levels of 256 shards each
+    return f'{digest[:2]}/{digest[2:4]}/{digest}{IMAGE_EXTENSIONS[content_type]}'
+
+def image_path(image: str) -> str | None:
+    # Filesystem path of a stored image name, None for names escaping IMAGE_DIR
+    # or pointing at in-progress files (temp files, upload sessions start with '.')
+    parts = image.replace('\\', '/').split('/')
+    if not image or any(part == '' or part.startswith('.') for part in parts):
+        return None
+    return os.path.join(IMAGE_DIR, *parts)
+
+def _upload_error(status_code: int, message: str, filename: str | None):
+    return HTTPException(status_code=status_code,
+                         detail={'status': Status.FAILED.value, 'message': message, 'filename': filename})
+
+async def _stream_to_temp(image: UploadFile) -> tuple[str, str]:
+    # Writes the upload to a temporary file chunk by chunk, hashing it on the way.
+    # Returns (temp path, content-addressed name).
+    async with upload_limiter:
+        os.makedirs(IMAGE_DIR, exist_ok=True)
+        temp_path = os.path.join(IMAGE_DIR, f'.upload-{os.urandom(8).hex()}.part')
+        digest = hashlib.sha256()
+        content_type = None
+        size = 0
+        try:
+            async with await anyio.open_file(temp_path, 'wb') as f:
+                while chunk := await image.read(IMAGE_CHUNK_SIZE):
+                    if size == 0:
+                        content_type = image_type(chunk)
+                        if content_type is None:
+                            raise _upload_error(415, 'Unsupported image type', image.filename)
+                    size += len(chunk)
+                    if size > IMAGE_MAX_BYTES:
+                        raise _upload_error(413, f'Image is larger than {IMAGE_MAX_BYTES} bytes', image.filename)
+                    digest.update(chunk)
+                    await f.write(chunk)
+            if size == 0:
+                raise _upload_error(400, 'Empty image', image.filename)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+    return temp_path, image_name(digest.hexdigest(), content_type)
+
+def _pin_path(image: str) -> str:
+    return os.path.join(IMAGE_PIN_DIR, image.replace('/', '_'))
+
+def pin_image(image: str) -> None:
+    # Starts the IMAGE_DELETE_GRACE window of a stored name. Kept next to the file,
+    # not in its mtime: derivatives and HTTP validators rely on the original's mtime
+    os.makedirs(IMAGE_PIN_DIR, exist_ok=True)
+    with open(_pin_path(image), 'a'):
+        pass
+    os.utime(_pin_path(image))
+
+def _in_grace(image: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(_pin_path(image)) < IMAGE_DELETE_GRACE
+    except FileNotFoundError:
+        return False
+
+def _store(temp_path: str, image: str) -> None:
+    path = image_path(image)
+    # Pinned first, so a release racing this upload leaves an existing copy alone
+    pin_image(image)
+    if os.path.exists(path):
+        # Already stored: keep the existing copy
+        os.remove(temp_path)
         return
-    save_path = f'images'
-    image_path = os.path.join(save_path, image)
-    if os.path.exists(image_path):
-        os.remove(image_path)
\ No newline at end of file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+
+def store_file(path: str, digest: str | None = None) -> str:
+    # Adds a complete file to the store under its content name (hard link, the
+    # source stays until its owner removes it). Reads the file once to hash it,
+    # unless its sha256 `digest` is already known.
+    with open(path, 'rb') as f:
+        content_type = image_type(f.read(16))
+        if content_type is None:
+            raise _upload_error(415, 'Unsupported image type', None)
+        if digest is None:
+            f.seek(0)
+            digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        image = image_name(digest, content_type)
+    target = image_path(image)
+    pin_image(image)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with suppress(FileExistsError):
+        os.link(path, target)
+    return image
+
+async def save_images(images: list[UploadFile]) -> list[str]:
+    # Streams all files concurrently (bounded by upload_limiter); files are only
+    # stored once every upload of the batch passed the limits.
+    # Returns the stored names, relative to IMAGE_DIR; identical files share one.
+    uploads = [None] * len(images)
+
+    async def stream(index: int, image: UploadFile):
+        uploads[index] = await _stream_to_temp(image)
+
+    try:
+        async with anyio.create_task_group() as tg:
+            for index, image in enumerate(images):
+                tg.start_soon(stream, index, image)
+    except BaseExceptionGroup as group:
+        for temp_path, _ in filter(None, uploads):
+            with suppress(FileNotFoundError):
+                os.remove(temp_path)
+        # Report the first upload error as is, not wrapped in a group
+        http_errors = group.subgroup(HTTPException)
+        if http_errors is not None:
+            raise http_errors.exceptions[0] from None
+        raise
+
+    for temp_path, image in uploads:
+        _store(temp_path, image)
+    return [image for _, image in uploads]
+
+async def save_image(image: UploadFile) -> str:
+    return (await save_images([image]))[0]
+
+async def referenced_images(session, images) -> set[str]:
+    # Names among `images` still used by a house or apartment row
+    images = set(images)
+    if not images:
+        return set()
+    statement = union(
+        select(House.main_image).where(House.main_image.in_(images)),
+        select(HouseImage.image).where(HouseImage.image.in_(images)),
+        select(Apartment.main_image).where(Apartment.main_image.in_(images)),
+        select(ApartmentImage.image).where(ApartmentImage.image.in_(images)))
+    return set((await session.execute(statement)).scalars())
+
+# Releases waiting for the grace window of their files to end
+_retries = set()
+
+async def release_images(images: list[str]) -> None:
+    # Background task run after the request committed: unlinks the files whose
+    # last reference is gone, checked against committed data on the primary
+    images = set(images)
+    if not images:
+        return
+    async with AsyncSessionLocal() as session:
+        images -= await referenced_images(session, images)
+    kept = [image for image in images if not delete_image(image)]
+    if kept:
+        # References are checked again once the grace window is over. A retry lost
+        # to a restart is made up by the sweep of compact_images.py
+        asyncio.get_running_loop().call_later(IMAGE_DELETE_GRACE, _retry_release, kept)
+
+def _retry_release(images: list[str]) -> None:
+    task = asyncio.create_task(release_images(images))
+    _retries.add(task)
+    task.add_done_callback(_retries.discard)
+
+def delete_image(image: str) -> bool:
+    # Unlinks the file, its derivatives and its pin; use release_images for files rows may share.
+    # Returns False when the file is kept for now, inside its grace window.
+    if image == "placeholder.png":
+        return True
+    path = image_path(image)
+    if path is None or not os.path.exists(path):
+        return True
+    if _in_grace(image):
+        # Just stored or re-uploaded: a transaction referencing it may not be committed yet
+        return False
+    os.remove(path)
+    delete_derivatives(image)
+    with suppress(FileNotFoundError):
+        os.remove(_pin_path(image))
+    return True
+
+def prune_pins() -> int:
+    # Pins past the grace window protect nothing any more
+    if not os.path.isdir(IMAGE_PIN_DIR):
+        return 0
+    deadline = time.time() - IMAGE_DELETE_GRACE
+    pruned = 0
+    for entry in os.scandir(IMAGE_PIN_DIR):
+        if entry.stat().st_mtime < deadline:
+            with suppress(FileNotFoundError):
+                os.remove(entry.path)
+                pruned += 1
+    return pruned
@@ -0,0 +1,148 @@
+import mimetypes
+import mmap
+import os
+import re
+import threading
+import anyio
+from collections import OrderedDict
+from email.utils import formatdate
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from config.images import IMAGE_HOT_CACHE_BYTES, IMAGE_HOT_FILE_MAX_BYTES, IMAGE_STREAM_CHUNK_SIZE
+from utils.versions import is_not_modified
+
+# Content-hashed names never change content (utils/image.image_name)
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+DERIVATIVE = 'public, max-age=86400'
+# Legacy names can be overwritten: cache, but revalidate with the ETag
+REVALIDATE = 'no-cache'
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class HotFileCache:
+    """LRU of small file bodies, bounded by their total size.
+
+    Keys include mtime and size, so a replaced file simply misses and its old
+    body ages out of the LRU.
+    """
+    def __init__(self, max_bytes: int = IMAGE_HOT_CACHE_BYTES, max_file_bytes: int = IMAGE_HOT_FILE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: tuple, body: bytes):
+        if len(body) > self.max_file_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+hot_files = HotFileCache()
+
+
+def hashed_etag(name: str) -> str | None:
+    match = HASHED_NAME_RE.match(name)
+    return f'"{match[1]}"' if match else None
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    # Single byte ranges only, anything else is answered with the whole file (RFC 9110, 14.2)
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or not (match[1] or match[2]):
+        return None
+    if match[1]:
+        start = int(match[1])
+        end = min(int(match[2]), size - 1) if match[2] else size - 1
+        if match[2] and int(match[2]) < start:
+            return None
+        if start >= size:
+            raise RangeNotSatisfiable()
+        return start, end
+    suffix = int(match[2])
+    if suffix == 0 or size == 0:
+        raise RangeNotSatisfiable()
+    return max(size - suffix, 0), size - 1
+
+
+def _read(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _mmap_chunks(path: str, start: int, end: int):
+    # Sync generator: StreamingResponse iterates it in the threadpool, so page
+    # faults on cold files do not stall the event loop
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(start, end, IMAGE_STREAM_CHUNK_SIZE):
+            yield mapped[offset:min(offset + IMAGE_STREAM_CHUNK_SIZE, end)]
+
+
+async def serve_file(request: Request, path: str, cache_control: str, etag: str | None = None,
+                     media_type: str | None = None, headers: dict | None = None) -> Response:
+    """Response for a stored file with validators, conditional GET and single byte ranges."""
+    stat = os.stat(path)
+    size = stat.st_size
+    headers = {
+        'ETag': etag or f'"{stat.st_mtime_ns:x}-{size:x}"',
+        'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+        **(headers or {}),
+    }
+    if is_not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since'),
+                       headers['ETag'], headers['Last-Modified']):
+        return Response(status_code=304, headers=headers)
+
+    media_type = media_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if_range = request.headers.get('if-range')
+    try:
+        byte_range = None
+        if if_range is None or if_range in (headers['ETag'], headers['Last-Modified']):
+            byte_range = parse_range(request.headers.get('range'), size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        status_code = 206
+        start, end = byte_range
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    if size <= hot_files.max_file_bytes:
+        key = (path, stat.st_mtime_ns, size)
+        body = hot_files.get(key)
+        if body is None:
+            body = await anyio.to_thread.run_sync(_read, path)
+            hot_files.set(key, body)
+        return Response(body[start:end + 1], status_code=status_code, media_type=media_type, headers=headers)
+
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(_mmap_chunks(path, start, end + 1), status_code=status_code,
+                             media_type=media_type, headers=headers)
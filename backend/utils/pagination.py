@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+from datetime import date
+from typing import NamedTuple, Any
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_, text, select, func
+from utils.enums import Status, TotalCount
+
+MAX_PAGE_SIZE = 100
+
+
+class PageParams:
+    """Opt-in keyset pagination parameters, used as `page: PageParams = Depends()`.
+
+    Without `limit` the whole (sorted) result is returned, as before.
+    """
+    def __init__(self,
+                 limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                 cursor: str | None = Query(None),
+                 sort: str = Query('id'),
+                 desc: bool = Query(False),
+                 total: TotalCount | None = Query(None)):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+        self.desc = desc
+        self.total = total
+
+
+class Page(NamedTuple):
+    items: list
+    next_cursor: str | None = None
+    total: int | None = None
+    total_estimated: bool = False
+
+
+def _invalid(message: str):
+    return HTTPException(status_code=400, detail={'status': Status.FAILED.value, 'message': message})
+
+
+def encode_cursor(sort: str, desc: bool, value: Any, id: int) -> str:
+    payload = json.dumps([sort, desc, value, id], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, column, sort: str, desc: bool):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_desc, value, id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError, binascii.Error):
+        raise _invalid('Invalid cursor')
+    if cursor_sort != sort or cursor_desc != desc:
+        raise _invalid('Cursor does not match sort order')
+    try:
+        python_type = column.type.python_type
+        if value is not None:
+            value = python_type.fromisoformat(value) if issubclass(python_type, date) else python_type(value)
+        id = int(id)
+    except (ValueError, TypeError):
+        raise _invalid('Invalid cursor')
+    return value, id
+
+
+async def count_total(repository, statement, mode: TotalCount) -> tuple[int, bool]:
+    session = repository.session
+    if (mode == TotalCount.ESTIMATE and statement.whereclause is None
+            and session.bind.dialect.name == 'mysql'):
+        # InnoDB statistics: O(1), but may be off by a few percent
+        estimate = (await session.execute(
+            text('SELECT TABLE_ROWS FROM information_schema.TABLES '
+                 'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name'),
+            {'name': repository.model.__tablename__}
+        )).scalar()
+        if estimate is not None:
+            return estimate, True
+    count = select(func.count()).select_from(statement.order_by(None).subquery())
+    return (await session.execute(count)).scalar_one(), False
+
+
+async def paginate(repository, statement, page: PageParams, sortable: tuple[str, ...]) -> Page:
+    """Seek pagination on (sort_key, id) of `repository.model`.
+
+    Every key in `sortable` must be backed by a (sort_key, id) index, so that a
+    page deep in the list costs the same as the first one.
+    """
+    model = repository.model
+    if page.sort not in sortable:
+        raise _invalid(f'Sort key must be one of: {", ".join(sortable)}')
+    column = getattr(model, page.sort)
+
+    total, total_estimated = None, False
+    if page.total:
+        total, total_estimated = await count_total(repository, statement, page.total)
+
+    if page.cursor:
+        value, last_id = decode_cursor(page.cursor, column, page.sort, page.desc)
+        if page.desc:
+            statement = statement.where(or_(column < value, and_(column == value, model.id < last_id)))
+        else:
+            statement = statement.where(or_(column > value, and_(column == value, model.id > last_id)))
+
+    if page.desc:
+        statement = statement.order_by(column.desc(), model.id.desc())
+    else:
+        statement = statement.order_by(column, model.id)
+
+    if page.limit is None:
+        return Page(await repository.all(statement), None, total, total_estimated)
+
+    items = await repository.all(statement.limit(page.limit + 1))
+    next_cursor = None
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        last = items[-1]
+        next_cursor = encode_cursor(page.sort, page.desc, getattr(last, page.sort), last.id)
+    return Page(items, next_cursor, total, total_estimated)
+
+
+def set_page_headers(response: Response, page: Page):
+    if page.next_cursor:
+        response.headers['X-Next-Cursor'] = page.next_cursor
+    if page.total is not None:
+        header = 'X-Total-Count-Estimate' if page.total_estimated else 'X-Total-Count'
+        response.headers[header] = str(page.total)
@@ -0,0 +1,105 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Counters for one engine's connection pool, read by /api/admin/pool."""
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.engine = None
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_checkout(self, overflow: bool):
+        with self._lock:
+            self.checkouts += 1
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        stats = {
+            'name': self.name,
+            'pool_class': type(pool).__name__,
+            'checkouts': self.checkouts,
+            'checkins': self.checkins,
+            'connects': self.connects,
+            'invalidations': self.invalidations,
+            'timeouts': self.timeouts,
+            'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            'wait_max_ms': round(self.wait_max * 1000, 3),
+        }
+        # Sizing and overflow exist only on queue-based pools (QueuePool and
+        # AsyncAdaptedQueuePool); other pools report just the counters
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checkedin=pool.checkedin(), checkedout=pool.checkedout(),
+                         overflow=pool.overflow(), overflow_checkouts=self.overflow_checkouts)
+        return stats
+
+
+class TimedPoolMixin:
+    """Measures how long a checkout waits for a free connection.
+
+    Pools have no "before checkout" event, so the wait is timed around
+    `_do_get`, the method QueuePool implementations block in.
+    """
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+pool_metrics: dict[str, PoolMetrics] = {}
+
+
+def timed_pool_class(pool_class, metrics: PoolMetrics):
+    # A class per engine: Pool.recreate() (engine.dispose()) builds the new pool
+    # from self.__class__, so the metrics survive it
+    return type(f'Timed{pool_class.__name__}', (TimedPoolMixin, pool_class), {'metrics': metrics})
+
+
+def instrument_engine(engine, metrics: PoolMetrics):
+    """Attaches pool events of `engine` (sync Engine or AsyncEngine.sync_engine) to `metrics`."""
+    metrics.engine = engine
+    pool_metrics[metrics.name] = metrics
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = engine.pool
+        metrics.record_checkout(overflow=isinstance(pool, QueuePool) and pool.checkedout() > pool.size())
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.checkins += 1
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
@@ -0,0 +1,59 @@
+import time
+from types import SimpleNamespace
+from config.cache import REFERENCE_CACHE_TTL
+from utils.to_dict import to_dict
+from utils.versions import table_versions
+
+
+class ReferenceCache:
+    """Process-wide copy of a small dictionary table (attributes, parameters,
+    categories), loaded in one query and served from memory.
+
+    The copy is stamped with the shared table version from utils.versions and
+    is reloaded on the first read after a write by any worker, or after `ttl`
+    seconds at the latest. Rows are detached
+    SimpleNamespace copies shared between requests, callers must not modify them.
+    """
+    def __init__(self, model, ttl: int = REFERENCE_CACHE_TTL):
+        self.model = model
+        self.ttl = ttl
+        self._state = None  # (rows, version, loaded_at), replaced as a whole
+
+    async def rows(self, repository) -> dict:
+        version = table_versions.version(self.model.__tablename__)
+        state = self._state
+        if state is not None and state[1] == version and time.monotonic() - state[2] < self.ttl:
+            return state[0]
+        # Version is read before loading: a write racing the load only causes one more reload.
+        # Concurrent requests may load the table twice, which is cheaper than serializing them.
+        loaded = await repository.all(repository.select_filter_by().order_by(self.model.id))
+        rows = {row.id: SimpleNamespace(**to_dict(row)) for row in loaded}
+        self._state = (rows, version, time.monotonic())
+        return rows
+
+    async def get_all(self, repository, **filter) -> list:
+        return [row for row in (await self.rows(repository)).values() if _matches(row, filter)]
+
+    async def get_one(self, repository, **filter):
+        if set(filter) == {'id'}:
+            return (await self.rows(repository)).get(filter['id'])
+        return next(iter(await self.get_all(repository, **filter)), None)
+
+    async def get_many(self, repository, ids) -> dict:
+        rows = await self.rows(repository)
+        return {id: rows[id] for id in ids if id in rows}
+
+    def clear(self):
+        self._state = None
+
+
+def _matches(row, filter: dict) -> bool:
+    # String comparison is case-insensitive like the default MySQL collation
+    for key, value in filter.items():
+        current = getattr(row, key)
+        if isinstance(value, str) and isinstance(current, str):
+            if current.casefold() != value.casefold():
+                return False
+        elif current != value:
+            return False
+    return True
@@ -0,0 +1,26 @@
+from starlette.types import ASGIApp, Scope, Receive, Send
+from config.database import READ_PRIMARY_COOKIE, REPLICA_LAG_SECONDS, ReplicaSessionLocals
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReadYourWritesMiddleware:
+    """After a successful write, pins the client's reads to the primary for
+    REPLICA_LAG_SECONDS with a short-lived cookie, so they never see a replica
+    that has not replayed the write yet. Does nothing without replicas.
+    """
+    def __init__(self, app: ASGIApp, max_age: float = REPLICA_LAG_SECONDS):
+        self.app = app
+        self.cookie = f'{READ_PRIMARY_COOKIE}=1; Max-Age={max(int(max_age), 1)}; Path=/; HttpOnly; SameSite=Lax'.encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] in SAFE_METHODS or not ReplicaSessionLocals:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                message = {**message, 'headers': [*message['headers'], (b'set-cookie', self.cookie)]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
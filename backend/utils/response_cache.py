@@ -0,0 +1,140 @@
+import asyncio
+from urllib.parse import parse_qsl, urlencode
+from starlette.types import ASGIApp, Scope, Receive, Send
+from config.cache import RESPONSE_CACHE_TTL, RESPONSE_CACHE_STALE_TTL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES
+from utils.cache import CacheBackend, MemoryCache
+from utils.versions import is_not_modified, table_versions
+
+# Path prefix -> tags of the data the response is built from. Service writes
+# invalidate these tags (see the @invalidates decorators in service/).
+CACHED_ROUTES = (
+    ('/api/houses', ('houses', 'apartments', 'attributes', 'parameters', 'categories')),
+    ('/api/apartments', ('apartments', 'parameters', 'categories')),
+    ('/api/house_attributes', ('attributes',)),
+    ('/api/apartment_parameters', ('parameters',)),
+    ('/api/apartment_category', ('categories',)),
+)
+
+CONDITIONAL_HEADERS = (b'if-none-match', b'if-modified-since')
+
+response_cache = MemoryCache(maxsize=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES)
+
+
+class ResponseCacheMiddleware:
+    """Read-through cache for catalog GET responses.
+
+    Fresh entries are served directly. Entries past their TTL but inside the
+    stale window are served as is while one background request per key
+    rebuilds them, so a refresh never shows up in client latency. Writes of
+    other workers reach the cache through utils/version_sync.py; while that
+    sync lags (TableVersions.is_current), requests bypass the cache.
+    """
+    def __init__(self, app: ASGIApp, cache: CacheBackend = response_cache,
+                 ttl: int = RESPONSE_CACHE_TTL, stale_ttl: int = RESPONSE_CACHE_STALE_TTL,
+                 routes=CACHED_ROUTES):
+        self.app = app
+        self.cache = cache
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.routes = routes
+        self._refreshing = set()
+        self._tasks = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        tags = self._tags(scope) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+        if tags is None or not table_versions.is_current():
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        entry = self.cache.lookup(key)
+        if entry is not None:
+            response, fresh = entry
+            if not fresh:
+                self._refresh_later(dict(scope), key, tags)
+            await self._send_cached(scope, send, response, 'HIT' if fresh else 'STALE')
+            return
+
+        version = self.cache.version
+        messages = []
+
+        async def send_wrapper(message):
+            messages.append(message)
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message['headers'], (b'x-cache', b'MISS')]}
+            await send(message)
+
+        await self.app(dict(scope), receive, send_wrapper)
+        self._store(key, tags, version, messages)
+
+    def _tags(self, scope: Scope):
+        path = scope['path']
+        for prefix, tags in self.routes:
+            if path == prefix or path.startswith(prefix + '/'):
+                return tags
+        return None
+
+    def _key(self, scope: Scope) -> str:
+        query = parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+        return f"{scope['path'].rstrip('/')}?{urlencode(sorted(query))}"
+
+    def _store(self, key, tags, version, messages):
+        start = next((m for m in messages if m['type'] == 'http.response.start'), None)
+        if start is None or start['status'] != 200:
+            return
+        headers = [(k, v) for k, v in start['headers'] if k.lower() != b'content-length']
+        if any(k.lower() == b'set-cookie' for k, _ in headers):
+            return
+        body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+        self.cache.set(key, (start['status'], headers, body), tags=tags, ttl=self.ttl,
+                       stale_ttl=self.stale_ttl, size=len(body), version=version)
+
+    async def _send_cached(self, scope: Scope, send: Send, response, cache_status: str):
+        status, headers, body = response
+        if self._not_modified(scope, headers):
+            # Validators were stored along with the response, answer 304 without the body
+            status, body = 304, b''
+            headers = [(k, v) for k, v in headers if k.lower() != b'content-type']
+        else:
+            headers = [*headers, (b'content-length', str(len(body)).encode())]
+        headers = [*headers, (b'x-cache', cache_status.encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _not_modified(self, scope: Scope, headers) -> bool:
+        request_headers = dict(scope['headers'])
+        response_headers = {k.lower(): v for k, v in headers}
+        if b'etag' not in response_headers and b'last-modified' not in response_headers:
+            return False
+        decode = lambda value: value.decode('latin-1') if value is not None else None
+        return is_not_modified(decode(request_headers.get(b'if-none-match')),
+                               decode(request_headers.get(b'if-modified-since')),
+                               decode(response_headers.get(b'etag')),
+                               decode(response_headers.get(b'last-modified')))
+
+    def _refresh_later(self, scope: Scope, key: str, tags):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(scope, key, tags))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, scope: Scope, key: str, tags):
+        # The client's validators would turn the refresh into a 304, which is not stored
+        scope['headers'] = [(name, value) for name, value in scope['headers']
+                            if name.lower() not in CONDITIONAL_HEADERS]
+        try:
+            version = self.cache.version
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await self.app(scope, receive, send)
+            self._store(key, tags, version, messages)
+        finally:
+            self._refreshing.discard(key)
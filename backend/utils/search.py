@@ -0,0 +1,183 @@
+import bisect
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from models import House, Apartment
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Light suffix stripping, longest suffix first. Stems shorter than
+# MIN_STEM are kept as is, prefix matching covers the rest.
+RU_SUFFIXES = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ов', 'ев', 'ей', 'ой', 'ий', 'ый',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+EN_SUFFIXES = ('ing', 'ed', 'es', 's')
+MIN_STEM = 3
+NAME_BOOST = 2
+MAX_PREFIX_EXPANSION = 50
+PREFIX_WEIGHT = 0.5
+K1 = 1.2
+B = 0.75
+
+
+def stem(token: str) -> str:
+    suffixes = EN_SUFFIXES if token.isascii() else RU_SUFFIXES
+    for suffix in suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return [stem(token) for token in TOKEN_RE.findall(text.lower().replace('ё', 'е'))]
+
+
+class SearchIndex:
+    """In-process inverted index with BM25 ranking and prefix matching.
+
+    Documents are keyed by (kind, id), e.g. ('house', 12). A rebuild fills a
+    separate index and swaps it in; changes made meanwhile are replayed on it.
+    """
+    def __init__(self):
+        self._postings = defaultdict(dict)  # term -> {key: tf}
+        self._terms = []  # sorted vocabulary for prefix lookups
+        self._documents = {}  # key -> (title, length, terms)
+        self._total_length = 0
+        self._replay = None  # changes since begin_rebuild
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, kind: str, id: int, title: str, texts: list[str | None]):
+        tokens = tokenize(title) * NAME_BOOST
+        for text in texts:
+            tokens += tokenize(text)
+        counts = Counter(tokens)
+        key = (kind, id)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(('add', (kind, id, title, texts)))
+            self._remove(key)
+            for term, tf in counts.items():
+                postings = self._postings[term]
+                if not postings:
+                    bisect.insort(self._terms, term)
+                postings[key] = tf
+            self._documents[key] = (title, len(tokens), tuple(counts))
+            self._total_length += len(tokens)
+
+    def remove(self, kind: str, id: int):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(('remove', (kind, id)))
+            self._remove((kind, id))
+
+    def begin_rebuild(self):
+        with self._lock:
+            self._replay = []
+
+    def finish_rebuild(self, fresh: 'SearchIndex | None'):
+        # Swaps in `fresh` with the changes made since begin_rebuild; None keeps the current index
+        with self._lock:
+            replay, self._replay = self._replay, None
+            if fresh is None:
+                return
+            for method, args in replay or ():
+                getattr(fresh, method)(*args)
+            self._postings, self._terms = fresh._postings, fresh._terms
+            self._documents, self._total_length = fresh._documents, fresh._total_length
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._terms.clear()
+            self._documents.clear()
+            self._total_length = 0
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        _, length, terms = document
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._terms, term)
+                if index < len(self._terms) and self._terms[index] == term:
+                    del self._terms[index]
+
+    def _expand(self, token: str) -> dict[str, float]:
+        # Exact stem at full weight, other terms sharing the prefix at PREFIX_WEIGHT
+        terms = {token: 1.0} if token in self._postings else {}
+        index = bisect.bisect_left(self._terms, token)
+        while index < len(self._terms) and len(terms) < MAX_PREFIX_EXPANSION:
+            term = self._terms[index]
+            if not term.startswith(token):
+                break
+            terms.setdefault(term, PREFIX_WEIGHT)
+            index += 1
+        return terms
+
+    def search(self, query: str, kind: str | None = None, limit: int = 20) -> list[tuple[str, int, str, float]]:
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            count = len(self._documents)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            scores = defaultdict(float)
+            for token in tokens:
+                for term, weight in self._expand(token).items():
+                    postings = self._postings[term]
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, tf in postings.items():
+                        if kind and key[0] != kind:
+                            continue
+                        length = self._documents[key][1]
+                        scores[key] += weight * idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length))
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [(kind, id, self._documents[(kind, id)][0], round(score, 4)) for (kind, id), score in best]
+
+
+search_index = SearchIndex()
+
+HOUSE_FIELDS = ('description', 'district', 'address')
+APARTMENT_FIELDS = ('description',)
+
+
+def is_indexed_update(entity: dict, fields: tuple[str, ...]) -> bool:
+    return 'name' in entity or any(field in entity for field in fields)
+
+
+def index_house(house, index: SearchIndex = search_index):
+    index.add('house', house.id, house.name, [getattr(house, field) for field in HOUSE_FIELDS])
+
+
+def index_apartment(apartment, index: SearchIndex = search_index):
+    index.add('apartment', apartment.id, apartment.name, [getattr(apartment, field) for field in APARTMENT_FIELDS])
+
+
+def rebuild_search_index(session):
+    # Searches keep using the current index until the new one is complete
+    fresh = SearchIndex()
+    search_index.begin_rebuild()
+    try:
+        for house in session.query(House).yield_per(1000):
+            index_house(house, fresh)
+        for apartment in session.query(Apartment).yield_per(1000):
+            index_apartment(apartment, fresh)
+    except BaseException:
+        search_index.finish_rebuild(None)
+        raise
+    search_index.finish_rebuild(fresh)
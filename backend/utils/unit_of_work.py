@@ -0,0 +1,64 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Session of the request being handled, set by get_async_session
+_current_session: ContextVar = ContextVar('unit_of_work_session', default=None)
+
+
+@asynccontextmanager
+async def unit_of_work(session_factory):
+    """One transaction per request: repositories only flush, the whole request
+    commits once at the end or rolls back on any exception."""
+    async with session_factory() as session:
+        _current_session.set(session)
+        try:
+            yield session
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+
+
+def savepoint(session):
+    """`async with savepoint(session):` runs a block in a nested transaction,
+    an exception inside rolls back only that block."""
+    return session.begin_nested()
+
+
+def on_commit(callback, session=None, key=None):
+    """Runs `callback` after the session's transaction commits, or right away
+    outside of a transaction. Callbacks of a rolled back transaction are dropped.
+    Callbacks with the same `key` run once per transaction."""
+    session = session if session is not None else _current_session.get()
+    if session is None or not session.in_transaction():
+        callback()
+        return
+    sync_session = getattr(session, 'sync_session', session)
+    callbacks = sync_session.info.setdefault('on_commit', {})
+    callbacks.setdefault(key if key is not None else object(), callback)
+
+
+def on_rollback(callback, session=None):
+    """Runs `callback` if the session's transaction rolls back instead of
+    committing, e.g. to undo a side effect made outside the database."""
+    session = session if session is not None else _current_session.get()
+    if session is None or not session.in_transaction():
+        return
+    sync_session = getattr(session, 'sync_session', session)
+    sync_session.info.setdefault('on_rollback', []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_on_commit(session):
+    session.info.pop('on_rollback', None)
+    for callback in session.info.pop('on_commit', {}).values():
+        callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_on_commit(session):
+    session.info.pop('on_commit', None)
+    for callback in session.info.pop('on_rollback', []):
+        callback()
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import suppress
+import anyio
+from fastapi import HTTPException
+from config.images import (IMAGE_MAX_BYTES, IMAGE_UPLOAD_DIR, IMAGE_UPLOAD_CHUNK_SIZE,
+                           IMAGE_UPLOAD_MIN_CHUNK_SIZE, IMAGE_UPLOAD_MAX_CHUNKS, IMAGE_UPLOAD_SESSION_TTL)
+from utils.enums import Status
+
+# Session layout, all on disk so any worker can serve any chunk:
+#   <IMAGE_UPLOAD_DIR>/<id>/meta.json   target, size, chunk_size
+#   <IMAGE_UPLOAD_DIR>/<id>/data        chunks written in place at their offsets
+#   <IMAGE_UPLOAD_DIR>/<id>/chunks/<n>  marker created once chunk n is fully written
+#   <IMAGE_UPLOAD_DIR>/<id>/sha256      digest of data, written once every chunk is hashed
+#   <IMAGE_UPLOAD_DIR>/<id>/finalize    claimed by the finalize call in progress
+#   <IMAGE_UPLOAD_DIR>/<id>/result.json response of the committed finalize
+SESSION_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Running sha256 of each session's contiguous received prefix, in this process:
+# {id: (end offset, hash)}. Stored hashes are never updated in place, writers
+# update a copy and store it, so no lock is needed; a lost race only means
+# re-reading a few chunks. Another worker's chunks are read back from data.
+_digests: dict = {}
+
+
+def _error(status_code: int, message: str):
+    return HTTPException(status_code=status_code, detail={'status': Status.FAILED.value, 'message': message})
+
+
+def _session_dir(id: str) -> str:
+    if not SESSION_ID_RE.match(id):
+        raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
+    return os.path.join(IMAGE_UPLOAD_DIR, id)
+
+
+def expire_sessions() -> None:
+    if not os.path.isdir(IMAGE_UPLOAD_DIR):
+        return
+    deadline = time.time() - IMAGE_UPLOAD_SESSION_TTL
+    for entry in os.scandir(IMAGE_UPLOAD_DIR):
+        if entry.is_dir() and entry.stat().st_mtime < deadline:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            _digests.pop(entry.name, None)
+
+
+def create_session(target: str, id_target: int, size: int, filename: str | None = None,
+                   chunk_size: int | None = None) -> dict:
+    if size > IMAGE_MAX_BYTES:
+        raise _error(413, f'Image is larger than {IMAGE_MAX_BYTES} bytes')
+    chunk_size = chunk_size or IMAGE_UPLOAD_CHUNK_SIZE
+    if chunk_size < IMAGE_UPLOAD_MIN_CHUNK_SIZE:
+        raise _error(413, f'Chunk size must be at least {IMAGE_UPLOAD_MIN_CHUNK_SIZE} bytes')
+    # Only the last chunk may be shorter, a small image is a single chunk
+    chunk_size = min(chunk_size, size)
+    if -(-size // chunk_size) > IMAGE_UPLOAD_MAX_CHUNKS:
+        raise _error(413, f'More than {IMAGE_UPLOAD_MAX_CHUNKS} chunks, use a larger chunk size')
+    expire_sessions()
+    meta = {'id': uuid.uuid4().hex, 'target': target, 'id_target': id_target, 'filename': filename,
+            'size': size, 'chunk_size': chunk_size}
+    path = os.path.join(IMAGE_UPLOAD_DIR, meta['id'])
+    os.makedirs(os.path.join(path, 'chunks'))
+    # Sparse file of the final size: chunks land at their offsets, nothing is concatenated later
+    with open(os.path.join(path, 'data'), 'wb') as f:
+        f.truncate(size)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    return session_state(meta['id'])
+
+
+def load_session(id: str) -> dict:
+    try:
+        with open(os.path.join(_session_dir(id), 'meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
+
+
+def chunk_count(meta: dict) -> int:
+    return -(-meta['size'] // meta['chunk_size'])
+
+
+def received_chunks(id: str) -> list[int]:
+    return sorted(int(name) for name in os.listdir(os.path.join(_session_dir(id), 'chunks')))
+
+
+def session_state(id: str) -> dict:
+    meta = load_session(id)
+    chunks = chunk_count(meta)
+    received = []
+    for index in received_chunks(id):
+        start, end = index * meta['chunk_size'], min((index + 1) * meta['chunk_size'], meta['size'])
+        if received and received[-1][1] == start:
+            received[-1][1] = end
+        else:
+            received.append([start, end])
+    return {**meta, 'chunks': chunks, 'received': received,
+            'complete': received == [[0, meta['size']]]}
+
+
+async def write_chunk(id: str, index: int, stream) -> dict:
+    """Streams one chunk of the request body into place; the chunk only counts
+    once all its bytes arrived, so a broken connection just means resending it.
+    Chunks are write-once: resending a received chunk changes nothing."""
+    meta = load_session(id)
+    if not 0 <= index < chunk_count(meta):
+        raise _error(416, f'Chunk {index} is out of range')
+    path = _session_dir(id)
+    if os.path.exists(os.path.join(path, 'chunks', str(index))):
+        return session_state(id)
+    offset = index * meta['chunk_size']
+    expected = min(meta['chunk_size'], meta['size'] - offset)
+    # The chunk right after the hashed prefix is hashed as it streams in
+    end, digest = _digests.get(id, (0, None))
+    digest = (digest.copy() if digest else hashlib.sha256()) if end == offset else None
+
+    written = 0
+    async with await anyio.open_file(os.path.join(path, 'data'), 'r+b') as f:
+        await f.seek(offset)
+        async for piece in stream:
+            written += len(piece)
+            if written > expected:
+                raise _error(413, f'Chunk {index} must be {expected} bytes')
+            await f.write(piece)
+            if digest:
+                digest.update(piece)
+    if written != expected:
+        raise _error(400, f'Chunk {index} must be {expected} bytes, got {written}')
+    open(os.path.join(path, 'chunks', str(index)), 'w').close()
+    if digest:
+        _store_digest(id, meta, offset + written, digest)
+    await anyio.to_thread.run_sync(_advance_digest, id, meta)
+    # Keeps active sessions from expiring
+    os.utime(path)
+    return session_state(id)
+
+
+def _store_digest(id: str, meta: dict, end: int, digest) -> None:
+    if end == meta['size']:
+        _digests.pop(id, None)
+        path = os.path.join(_session_dir(id), 'sha256')
+        temp_path = f'{path}.{uuid.uuid4().hex}'
+        with open(temp_path, 'w') as f:
+            f.write(digest.hexdigest())
+        os.replace(temp_path, path)
+    elif end > _digests.get(id, (0, None))[0]:
+        _digests[id] = (end, digest)
+
+
+def _advance_digest(id: str, meta: dict) -> None:
+    # Hashes received chunks past the hashed prefix, reading them back from data:
+    # chunks that arrived ahead of a gap, or were written by another worker
+    end, digest = _digests.get(id, (0, None))
+    received = set(received_chunks(id))
+    if end == meta['size'] or end // meta['chunk_size'] not in received:
+        return
+    digest = digest.copy() if digest else hashlib.sha256()
+    with open(data_path(id), 'rb') as f:
+        f.seek(end)
+        while end < meta['size'] and end // meta['chunk_size'] in received:
+            piece = f.read(min(meta['chunk_size'], meta['size'] - end))
+            digest.update(piece)
+            end += len(piece)
+    _store_digest(id, meta, end, digest)
+
+
+def upload_digest(id: str) -> str:
+    # sha256 hex digest of a complete upload
+    path = os.path.join(_session_dir(id), 'sha256')
+    if not os.path.exists(path):
+        # Hashing was interrupted (e.g. a restart), catch up from the data file
+        _advance_digest(id, load_session(id))
+    with open(path) as f:
+        return f.read()
+
+
+def claim_finalize(id: str) -> dict | None:
+    """Returns the response of an already committed finalize, or claims the
+    session for this call; a concurrent finalize gets 409 until the claim is
+    released or the result stored."""
+    path = _session_dir(id)
+    try:
+        with open(os.path.join(path, 'result.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    try:
+        os.close(os.open(os.path.join(path, 'finalize'), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        raise _error(409, 'Upload is being finalized')
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail={'status': Status.NOT_FOUND.value})
+    return None
+
+
+def store_result(id: str, result: dict) -> None:
+    path = os.path.join(_session_dir(id), 'result.json')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(result, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def release_finalize(id: str) -> None:
+    with suppress(FileNotFoundError):
+        os.remove(os.path.join(_session_dir(id), 'finalize'))
+
+
+def data_path(id: str) -> str:
+    return os.path.join(_session_dir(id), 'data')
+
+
+def delete_data(id: str) -> None:
+    # After finalize: the stored image is a hard link of its own, the session
+    # keeps its state and result until it expires
+    with suppress(FileNotFoundError):
+        os.remove(data_path(id))
+
+
+def delete_session(id: str) -> None:
+    shutil.rmtree(_session_dir(id), ignore_errors=True)
+    _digests.pop(id, None)
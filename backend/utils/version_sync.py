@@ -0,0 +1,113 @@
+import asyncio
+import time
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from config.cache import TABLE_VERSIONS_POLL_INTERVAL
+from config.database import Base
+from models import TableVersion
+from utils.cache import invalidate_tags
+from utils.search import rebuild_search_index
+from utils.unit_of_work import on_commit
+from utils.versions import table_versions
+
+# Table -> cache tags built from it (see the @invalidates decorators in service/)
+TABLE_TAGS = {
+    'houses': ('houses',),
+    'house_attributes': ('houses',),
+    'house_images': ('houses',),
+    'attributes': ('attributes',),
+    'apartments': ('apartments',),
+    'apartments_parameters': ('apartments',),
+    'apartment_images': ('apartments',),
+    'parameters': ('parameters',),
+    'apartment_category': ('categories',),
+}
+# Tables the search index is built from (utils/search.py)
+SEARCH_TABLES = {'houses', 'apartments'}
+# Set when another worker changed SEARCH_TABLES, cleared by refresh_search_index
+_search_stale = False
+
+
+def touch(session, *tables):
+    """Marks tables as written by the session's transaction; their shared
+    versions are bumped as part of its commit."""
+    sync_session = getattr(session, 'sync_session', session)
+    sync_session.info.setdefault('touched_tables', set()).update(tables)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_versions(session):
+    tables = session.info.pop('touched_tables', None)
+    if not tables:
+        return
+    # Inside the committed transaction: the rows change together with the data
+    session.execute(update(TableVersion).where(TableVersion.name.in_(tables))
+                    .values(version=TableVersion.version + 1, modified=int(time.time())))
+    rows = session.execute(select(TableVersion.name, TableVersion.version, TableVersion.modified)
+                           .where(TableVersion.name.in_(tables))).all()
+    on_commit(lambda: _apply(rows, local=True), session=session, key='table_versions')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_touched(session):
+    session.info.pop('touched_tables', None)
+
+
+def _apply(rows, local: bool = False):
+    global _search_stale
+    changed = table_versions.apply(rows, local=local)
+    if changed & SEARCH_TABLES:
+        _search_stale = True
+    tags = {tag for table in changed for tag in TABLE_TAGS.get(table, ())}
+    if tags:
+        invalidate_tags(*tags)
+
+
+async def seed_table_versions(session_factory):
+    # Rows for tables created without the migration (e.g. metadata.create_all)
+    async with session_factory() as session:
+        existing = set((await session.execute(select(TableVersion.name))).scalars())
+        missing = [name for name in Base.metadata.tables if name != TableVersion.__tablename__ and name not in existing]
+        if not missing:
+            return
+        session.add_all(TableVersion(name=name, version=0, modified=int(time.time())) for name in missing)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Another worker seeded them first
+            await session.rollback()
+
+
+async def sync_table_versions(session_factory):
+    # Always the primary: a replica would report versions behind the data
+    async with session_factory() as session:
+        rows = (await session.execute(select(TableVersion.name, TableVersion.version, TableVersion.modified))).all()
+    _apply(rows)
+    table_versions.mark_synced()
+
+
+async def refresh_search_index(session_factory):
+    # The index only sees this worker's commits: other workers' writes need a rebuild
+    global _search_stale
+    _search_stale = False
+    async with session_factory() as session:
+        await session.run_sync(rebuild_search_index)
+
+
+async def poll_once(session_factory):
+    await sync_table_versions(session_factory)
+    if _search_stale:
+        # One rebuild per poll, however many writes it picked up
+        await refresh_search_index(session_factory)
+
+
+async def poll_table_versions(session_factory, interval: float = TABLE_VERSIONS_POLL_INTERVAL):
+    """Runs for the lifetime of the worker. A failed poll is retried on the
+    next tick; TableVersions.is_current covers the time in between."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await poll_once(session_factory)
+        except (SQLAlchemyError, OSError):
+            pass
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode
+from fastapi import HTTPException, Request, Response
+from config.cache import TABLE_VERSIONS_MAX_LAG
+
+
+class TableVersions:
+    """Per-table write counters shared by all workers through the
+    `table_versions` table (models/versions.py, kept by utils/version_sync.py).
+
+    Every commit that writes a table bumps its row; the committing worker
+    applies the new value right away, the others within one poll interval.
+    Validators built from these counters are therefore the same on every
+    worker. `is_current` is False until the first poll and whenever polling
+    falls behind by more than TABLE_VERSIONS_MAX_LAG, so that nothing is
+    answered from possibly outdated versions.
+    """
+    def __init__(self, max_lag: float = TABLE_VERSIONS_MAX_LAG):
+        self.max_lag = max_lag
+        self._started = time.time()
+        self._versions = {}
+        self._modified = {}
+        self._synced_at = None
+        # Last commit by this worker, and last version change adopted from another one
+        self.last_write = 0.0
+        self.last_remote_write = 0.0
+        self._lock = threading.Lock()
+
+    def apply(self, rows, local: bool = False) -> set:
+        """Takes (name, version, modified) rows and returns the tables changed
+        by other workers. `local` rows come from this worker's own commit."""
+        changed = set()
+        with self._lock:
+            for name, version, modified in rows:
+                current = self._versions.get(name)
+                if current is not None and version <= current:
+                    continue
+                # A local commit skipping a number means another worker wrote in between
+                if not local or current is None or version > current + 1:
+                    changed.add(name)
+                self._versions[name] = version
+                self._modified[name] = modified
+            if local:
+                self.last_write = time.time()
+            elif changed:
+                self.last_remote_write = time.time()
+        return changed
+
+    def mark_synced(self):
+        self._synced_at = time.monotonic()
+
+    def is_current(self) -> bool:
+        return self._synced_at is not None and time.monotonic() - self._synced_at < self.max_lag
+
+    def version(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def last_modified(self, tables) -> float:
+        return max((self._modified.get(table, self._started) for table in tables), default=self._started)
+
+    def etag(self, tables, resource: str) -> str:
+        state = ','.join(f'{table}:{self.version(table)}' for table in sorted(tables))
+        digest = hashlib.sha1(f'{resource}|{state}'.encode()).hexdigest()
+        return f'"{digest}"'
+
+
+table_versions = TableVersions()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+def _timestamp(http_date: str) -> float | None:
+    try:
+        return parsedate_to_datetime(http_date).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def is_not_modified(if_none_match: str | None, if_modified_since: str | None,
+                    etag: str | None, last_modified: str | None) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110, 13.2.2)
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+    if if_modified_since is None or last_modified is None:
+        return False
+    since, modified = _timestamp(if_modified_since), _timestamp(last_modified)
+    return since is not None and modified is not None and modified <= since
+
+
+def conditional_get(*tables):
+    """Dependency adding ETag/Last-Modified built from the table versions and
+    answering If-None-Match/If-Modified-Since with 304 before the endpoint runs.
+    No 304 is sent while the versions are not current (see TableVersions)."""
+    def dependency(request: Request, response: Response):
+        resource = f'{request.url.path.rstrip("/")}?{urlencode(sorted(request.query_params.multi_items()))}'
+        headers = {'ETag': table_versions.etag(tables, resource),
+                   'Last-Modified': formatdate(table_versions.last_modified(tables), usegmt=True),
+                   'Cache-Control': 'no-cache'}
+        if table_versions.is_current() and is_not_modified(request.headers.get('if-none-match'),
+                                                           request.headers.get('if-modified-since'),
+                                                           headers['ETag'], headers['Last-Modified']):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return dependency